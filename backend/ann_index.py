@@ -0,0 +1,535 @@
+import os
+import sys
+import pickle
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from index_files import file_lock, file_version
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """L2-normalize vectors so inner product equals cosine similarity"""
+    array = np.asarray(vectors, dtype=np.float32)
+    if array.ndim == 1:
+        array = array.reshape(1, -1)
+    norms = np.linalg.norm(array, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return array / norms
+
+
+class ANNIndex(ABC):
+    """In-process approximate nearest-neighbour index over chunk embeddings.
+
+    Subclasses store unit-normalized vectors under int64 labels; this base class
+    maps chunk IDs to labels and persists that mapping next to the index file.
+    As with BM25Index, changes since the last save are logged so that saving merges
+    in whatever another process saved meanwhile instead of overwriting it.
+    """
+
+    # Whether files saved by another process can be loaded and merged
+    MERGEABLE = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._labels: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        self._next_label = 0
+        self._dirty = False
+        # chunk_id -> normalized vector, or None for a delete, since the last save
+        self._changes: Dict[str, Optional[np.ndarray]] = {}
+        self._cleared = False
+        self._version = None
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def add(self, chunk_ids: Sequence[str], vectors):
+        """Insert or replace vectors for the given chunk IDs"""
+        if not chunk_ids:
+            return
+
+        vectors = normalize_rows(vectors)
+        with self._lock:
+            self._insert(chunk_ids, vectors)
+            if self.MERGEABLE:
+                self._changes.update(zip(chunk_ids, vectors))
+            self._dirty = True
+
+    def delete(self, chunk_ids: Sequence[str]):
+        """Remove vectors for the given chunk IDs"""
+        with self._lock:
+            labels = [self._labels.pop(chunk_id) for chunk_id in chunk_ids if chunk_id in self._labels]
+            for label in labels:
+                del self._ids[label]
+            if labels:
+                self._remove_labels(labels)
+                self._dirty = True
+            if self.MERGEABLE:
+                for chunk_id in chunk_ids:
+                    self._changes[chunk_id] = None
+                    self._dirty = True
+
+    def clear(self):
+        """Remove every vector"""
+        with self._lock:
+            self._labels = {}
+            self._ids = {}
+            self._next_label = 0
+            self._reset()
+            self._dirty = True
+            self._changes = {}
+            self._cleared = True
+
+    def search(self, query_vector, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (chunk_id, cosine similarity) pairs, best first"""
+        with self._lock:
+            if not self._labels:
+                return []
+
+            labels, similarities = self._search_vectors(normalize_rows(query_vector), k)
+            return [
+                (self._ids[label], float(similarity))
+                for label, similarity in zip(labels, similarities)
+                if label in self._ids
+            ]
+
+    def save(self):
+        """Persist the index and its ID mapping, if they changed since the last save"""
+        with self._sync_lock, file_lock(self.path):
+            self._merge_saved()
+
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._save_index()
+                tmp_path = f"{self.path}.ids.tmp"
+                with open(tmp_path, 'wb') as file:
+                    pickle.dump({'labels': self._labels, 'next_label': self._next_label}, file)
+                os.replace(tmp_path, f"{self.path}.ids")
+                self._dirty = False
+                self._changes = {}
+                self._cleared = False
+            self._version = file_version(f"{self.path}.ids")
+
+    def _merge_saved(self) -> bool:
+        """Replace the index with the saved one plus this process's unsaved changes, if it changed"""
+        # The ID mapping is written after the index, so its version covers both files
+        version = file_version(f"{self.path}.ids")
+        if version == self._version:
+            return False
+        if version is None or self._cleared or not self.MERGEABLE:
+            if version is not None and not self._cleared:
+                print(f"ANN index {self.path} was written by another process; it only supports one writer")
+            self._version = version
+            return False
+
+        index = self._read_index()
+        labels, next_label = self._read_ids()
+        with self._lock:
+            self._install_index(index)
+            self._labels = labels
+            self._ids = {label: chunk_id for chunk_id, label in labels.items()}
+            self._next_label = next_label
+
+            stale = [self._labels.pop(chunk_id) for chunk_id in self._changes if chunk_id in self._labels]
+            for label in stale:
+                del self._ids[label]
+            if stale:
+                self._remove_labels(stale)
+            added = [(chunk_id, vector) for chunk_id, vector in self._changes.items() if vector is not None]
+            if added:
+                self._insert([chunk_id for chunk_id, _ in added], np.stack([vector for _, vector in added]))
+        self._version = version
+        return True
+
+    def _insert(self, chunk_ids: Sequence[str], vectors: np.ndarray):
+        """Store normalized vectors under new labels, replacing existing ones (lock must be held)"""
+        replaced = [self._labels[chunk_id] for chunk_id in chunk_ids if chunk_id in self._labels]
+        if replaced:
+            self._remove_labels(replaced)
+
+        labels = []
+        for chunk_id in chunk_ids:
+            label = self._next_label
+            self._next_label += 1
+            self._labels[chunk_id] = label
+            self._ids[label] = chunk_id
+            labels.append(label)
+
+        self._add_vectors(np.asarray(labels, dtype=np.int64), vectors)
+
+    def _read_ids(self) -> Tuple[Dict[str, int], int]:
+        """Chunk ID -> label mapping and next free label from the saved file"""
+        with open(f"{self.path}.ids", 'rb') as file:
+            state = pickle.load(file)
+        return state['labels'], state['next_label']
+
+    def _load_ids(self) -> bool:
+        """Load the ID mapping saved alongside the index, if any"""
+        ids_path = f"{self.path}.ids"
+        if not (os.path.exists(self.path) and os.path.exists(ids_path)):
+            return False
+
+        self._version = file_version(ids_path)
+        self._labels, self._next_label = self._read_ids()
+        self._ids = {label: chunk_id for chunk_id, label in self._labels.items()}
+        return True
+
+    @abstractmethod
+    def _add_vectors(self, labels: np.ndarray, vectors: np.ndarray):
+        """Store normalized vectors under the given labels"""
+
+    @abstractmethod
+    def _remove_labels(self, labels: List[int]):
+        """Drop the vectors stored under the given labels"""
+
+    @abstractmethod
+    def _search_vectors(self, query: np.ndarray, k: int) -> Tuple[List[int], List[float]]:
+        """Labels and inner products of the k nearest stored vectors, best first"""
+
+    @abstractmethod
+    def _reset(self):
+        """Replace the backend index with an empty one"""
+
+    @abstractmethod
+    def _save_index(self):
+        """Write the backend index to self.path"""
+
+    # Only backends with MERGEABLE set need to read and swap in a saved index
+
+    def _read_index(self):
+        """Load the backend index saved at self.path"""
+        raise NotImplementedError
+
+    def _install_index(self, index):
+        """Replace the backend index with one returned by _read_index (lock must be held)"""
+        raise NotImplementedError
+
+
+class FaissANNIndex(ANNIndex):
+    """FAISS inverted-file index; exact flat search until enough vectors exist to train it"""
+
+    def __init__(self, path: str, dim: int):
+        super().__init__(path)
+        import faiss
+        self.faiss = faiss
+        self.dim = dim
+        self.nlist = int(os.getenv('FAISS_NLIST', 1024))
+        self.nprobe = int(os.getenv('FAISS_NPROBE', 16))
+        # Train the IVF quantizer once there are this many vectors per list on average
+        self.train_threshold = self.nlist * int(os.getenv('FAISS_TRAIN_POINTS_PER_LIST', 39))
+
+        self.index = None
+        try:
+            if self._load_ids():
+                self.index = self._read_index()
+        except Exception as e:
+            print(f"Could not load FAISS index, starting empty: {str(e)}")
+            self._labels, self._ids, self._next_label = {}, {}, 0
+        if self.index is None:
+            self._reset()
+        self._apply_search_params()
+
+    def _reset(self):
+        self.index = self.faiss.IndexIDMap2(self.faiss.IndexFlatIP(self.dim))
+
+    def _is_ivf(self) -> bool:
+        return isinstance(self.index, self.faiss.IndexIVF)
+
+    def _apply_search_params(self):
+        if self._is_ivf():
+            self.index.nprobe = self.nprobe
+
+    def _add_vectors(self, labels: np.ndarray, vectors: np.ndarray):
+        self.index.add_with_ids(vectors, labels)
+        if not self._is_ivf() and self.index.ntotal >= self.train_threshold:
+            self._train_ivf()
+
+    def _train_ivf(self):
+        """Move from the exact flat index to a trained IVF index"""
+        labels = self.faiss.vector_to_array(self.index.id_map).astype(np.int64)
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+
+        quantizer = self.faiss.IndexFlatIP(self.dim)
+        ivf = self.faiss.IndexIVFFlat(quantizer, self.dim, self.nlist, self.faiss.METRIC_INNER_PRODUCT)
+        ivf.train(vectors)
+        ivf.add_with_ids(vectors, labels)
+        self.index = ivf
+        self._apply_search_params()
+        print(f"Trained FAISS IVF index with {self.nlist} lists over {len(labels)} vectors")
+
+    def _remove_labels(self, labels: List[int]):
+        self.index.remove_ids(np.asarray(labels, dtype=np.int64))
+
+    def _search_vectors(self, query: np.ndarray, k: int) -> Tuple[List[int], List[float]]:
+        similarities, labels = self.index.search(query, k)
+        return (
+            [int(label) for label in labels[0] if label != -1],
+            [float(score) for label, score in zip(labels[0], similarities[0]) if label != -1]
+        )
+
+    def _save_index(self):
+        tmp_path = f"{self.path}.tmp"
+        self.faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def _read_index(self):
+        return self.faiss.read_index(self.path)
+
+    def _install_index(self, index):
+        self.index = index
+        self._apply_search_params()
+
+
+class HnswANNIndex(ANNIndex):
+    """hnswlib graph index with deletions handled by marking labels deleted"""
+
+    def __init__(self, path: str, dim: int):
+        super().__init__(path)
+        import hnswlib
+        self.hnswlib = hnswlib
+        self.dim = dim
+        self.m = int(os.getenv('HNSW_M', 16))
+        self.ef_construction = int(os.getenv('HNSW_EF_CONSTRUCTION', 200))
+        self.ef_search = int(os.getenv('HNSW_EF_SEARCH', 64))
+
+        self.index = None
+        try:
+            if self._load_ids():
+                self.index = self._read_index()
+        except Exception as e:
+            print(f"Could not load hnswlib index, starting empty: {str(e)}")
+            self._labels, self._ids, self._next_label = {}, {}, 0
+            self.index = None
+        if self.index is None:
+            self._reset()
+        self.index.set_ef(self.ef_search)
+
+    def _reset(self):
+        self.index = self.hnswlib.Index(space='ip', dim=self.dim)
+        self.index.init_index(
+            max_elements=1024,
+            M=self.m,
+            ef_construction=self.ef_construction,
+            allow_replace_deleted=True
+        )
+        self.index.set_ef(self.ef_search)
+
+    def _add_vectors(self, labels: np.ndarray, vectors: np.ndarray):
+        needed = self.index.get_current_count() + len(labels)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, self.index.get_max_elements() * 2))
+        self.index.add_items(vectors, labels, replace_deleted=True)
+
+    def _remove_labels(self, labels: List[int]):
+        for label in labels:
+            self.index.mark_deleted(label)
+
+    def _search_vectors(self, query: np.ndarray, k: int) -> Tuple[List[int], List[float]]:
+        k = min(k, len(self._labels))
+        self.index.set_ef(max(self.ef_search, k))
+        labels, distances = self.index.knn_query(query, k=k)
+        # hnswlib's "ip" space reports 1 - inner product
+        return [int(label) for label in labels[0]], [1.0 - float(d) for d in distances[0]]
+
+    def _save_index(self):
+        tmp_path = f"{self.path}.tmp"
+        self.index.save_index(tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def _read_index(self):
+        index = self.hnswlib.Index(space='ip', dim=self.dim)
+        index.load_index(self.path, allow_replace_deleted=True)
+        return index
+
+    def _install_index(self, index):
+        self.index = index
+        self.index.set_ef(self.ef_search)
+
+
+class Int8ANNIndex(ANNIndex):
+    """Exact search over int8-quantized vectors in memory-mapped files, re-ranked in float32.
+
+    Each unit vector is stored as int8 codes with a per-vector scale (dim + 4 bytes
+    instead of 4 * dim). The first pass scores every code block; the best
+    candidates are then re-scored exactly from a float32 copy that stays on disk
+    and is only paged in for those rows. The Chroma collection keeps its own float32
+    embeddings and HNSW graph, so this index adds to its memory instead of replacing it.
+    """
+
+    BLOCK_ROWS = 4096
+    # Rows are written into the shared memory-mapped files in place, so only one
+    # process may write an int8 index at a time
+    MERGEABLE = False
+
+    def __init__(self, path: str, dim: int):
+        super().__init__(path)
+        self.dim = dim
+        # Candidates re-ranked exactly per requested result
+        self.rerank_factor = int(os.getenv('INT8_RERANK_FACTOR', 8))
+
+        self._capacity = 0
+        self._codes = None
+        self._scales = None
+        self._vectors = None
+        self._row_labels = np.zeros(0, dtype=np.int64)
+        self._label_rows = np.zeros(0, dtype=np.int64)
+        self._free_rows: List[int] = []
+        # Rows freed since the last save; the saved row map still points labels at them,
+        # so overwriting them before it is replaced would corrupt the index after a crash
+        self._released_rows: List[int] = []
+        self._used_rows = 0
+        self._block = np.empty((self.BLOCK_ROWS, dim), dtype=np.float32)
+
+        try:
+            if self._load_ids():
+                self._load_rows()
+        except Exception as e:
+            print(f"Could not load int8 index, starting empty: {str(e)}")
+            self._labels, self._ids, self._next_label = {}, {}, 0
+            self._reset()
+        if self._codes is None:
+            self._reset()
+
+    def memory_bytes_per_vector(self) -> float:
+        """Resident bytes per stored vector: codes, scale, row maps and the chunk ID <-> label dicts"""
+        count = max(len(self._labels), 1)
+        row_maps = self._row_labels.nbytes + self._label_rows.nbytes
+        # The chunk ID strings and label ints are shared by both dicts, so they are counted once
+        id_maps = sys.getsizeof(self._labels) + sys.getsizeof(self._ids) + sum(
+            sys.getsizeof(chunk_id) + sys.getsizeof(label) for chunk_id, label in self._labels.items()
+        )
+        return self.dim + 4 + (row_maps + id_maps) / count
+
+    def _file(self, suffix: str) -> str:
+        return f"{self.path}{suffix}"
+
+    def _files(self) -> List[Tuple[str, int]]:
+        """(path, bytes per row) of the codes, scales and float32 vectors"""
+        return [(self.path, self.dim), (self._file('.scales'), 4), (self._file('.vectors'), 4 * self.dim)]
+
+    def _open(self, capacity: int, mode: str):
+        self._codes = np.memmap(self.path, dtype=np.int8, mode=mode, shape=(capacity, self.dim))
+        self._scales = np.memmap(self._file('.scales'), dtype=np.float32, mode=mode, shape=(capacity,))
+        self._vectors = np.memmap(self._file('.vectors'), dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _grow(self, needed: int):
+        """Extend the memory-mapped files to hold at least `needed` rows"""
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, self._capacity * 2, 1024)
+        for name, row_bytes in self._files():
+            with open(name, 'ab') as file:
+                file.truncate(capacity * row_bytes)
+        self._open(capacity, 'r+')
+        self._row_labels = np.concatenate([self._row_labels, np.full(capacity - len(self._row_labels), -1, dtype=np.int64)])
+
+    def _reset(self):
+        # Drop the old mappings before the files are truncated underneath them
+        self._codes = self._scales = self._vectors = None
+        for name, row_bytes in self._files():
+            with open(name, 'wb') as file:
+                file.truncate(1024 * row_bytes)
+        self._open(1024, 'r+')
+        self._row_labels = np.full(1024, -1, dtype=np.int64)
+        self._label_rows = np.zeros(0, dtype=np.int64)
+        self._free_rows = []
+        self._released_rows = []
+        self._used_rows = 0
+
+    def _load_rows(self):
+        state = np.load(self._file('.rows.npy'))
+        self._row_labels = state.astype(np.int64)
+        self._open(len(self._row_labels), 'r+')
+        self._used_rows = int(np.max(np.nonzero(self._row_labels >= 0)[0], initial=-1)) + 1
+        self._free_rows = [int(row) for row in np.nonzero(self._row_labels[:self._used_rows] < 0)[0]]
+        self._label_rows = np.full(self._next_label, -1, dtype=np.int64)
+        live = np.nonzero(self._row_labels >= 0)[0]
+        self._label_rows[self._row_labels[live]] = live
+
+    def _add_vectors(self, labels: np.ndarray, vectors: np.ndarray):
+        rows = []
+        for _ in range(len(labels)):
+            if self._free_rows:
+                rows.append(self._free_rows.pop())
+            else:
+                rows.append(self._used_rows)
+                self._used_rows += 1
+        self._grow(self._used_rows)
+        rows = np.asarray(rows, dtype=np.int64)
+
+        # Symmetric per-vector quantization
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        self._codes[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+        self._scales[rows] = scales
+        self._vectors[rows] = vectors
+
+        if len(self._label_rows) < self._next_label:
+            self._label_rows = np.concatenate([
+                self._label_rows, np.full(self._next_label - len(self._label_rows), -1, dtype=np.int64)
+            ])
+        self._row_labels[rows] = labels
+        self._label_rows[labels] = rows
+
+    def _remove_labels(self, labels: List[int]):
+        rows = self._label_rows[labels]
+        self._row_labels[rows] = -1
+        self._label_rows[labels] = -1
+        self._released_rows.extend(int(row) for row in rows)
+
+    def _search_vectors(self, query: np.ndarray, k: int) -> Tuple[List[int], List[float]]:
+        query = query[0]
+        used = self._used_rows
+        approximate = np.empty(used, dtype=np.float32)
+
+        # First pass over the codes, block by block to keep the float buffer small
+        for start in range(0, used, self.BLOCK_ROWS):
+            codes = self._codes[start:min(start + self.BLOCK_ROWS, used)]
+            block = self._block[:len(codes)]
+            np.copyto(block, codes, casting='unsafe')
+            np.dot(block, query, out=approximate[start:start + len(codes)])
+        approximate *= self._scales[:used]
+        approximate[self._row_labels[:used] < 0] = -np.inf
+
+        live = len(self._labels)
+        candidates = min(live, max(k * self.rerank_factor, k))
+        if candidates < used:
+            rows = np.argpartition(-approximate, candidates - 1)[:candidates]
+        else:
+            rows = np.arange(used)
+        rows = rows[np.isfinite(approximate[rows])]
+
+        # Exact re-rank from the float32 copy
+        rows.sort()
+        exact = self._vectors[rows] @ query
+        order = np.argsort(-exact)[:k]
+        return [int(label) for label in self._row_labels[rows[order]]], [float(score) for score in exact[order]]
+
+    def _save_index(self):
+        self._codes.flush()
+        self._scales.flush()
+        self._vectors.flush()
+        tmp_path = self._file('.rows.tmp.npy')
+        np.save(tmp_path, self._row_labels)
+        os.replace(tmp_path, self._file('.rows.npy'))
+        self._free_rows.extend(self._released_rows)
+        self._released_rows = []
+
+
+def create_ann_index(backend: str, directory: str, dim: int) -> Optional[ANNIndex]:
+    """Build the configured ANN backend, or None to search through Chroma"""
+    backend = backend.lower()
+    if backend == 'chroma':
+        return None
+    if backend == 'faiss':
+        return FaissANNIndex(os.path.join(directory, 'ann_faiss.index'), dim)
+    if backend == 'hnswlib':
+        return HnswANNIndex(os.path.join(directory, 'ann_hnswlib.index'), dim)
+    if backend == 'int8':
+        return Int8ANNIndex(os.path.join(directory, 'ann_int8.codes'), dim)
+    raise ValueError(f"Unknown ANN_BACKEND: {backend}")
@@ -0,0 +1,119 @@
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+class SemanticAnswerCache:
+    """Reuses answers to near-duplicate questions that retrieved the same chunks.
+
+    Entries are grouped by their exact set of source chunk IDs (plus an optional
+    conversation key), so a lookup compares embeddings only within one group.
+    Entries are evicted when any of their source chunks is deleted or re-ingested.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float, similarity_threshold: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._lock = threading.Lock()
+        # entry id -> (group key, unit query vector, value, expires_at)
+        self._entries: "OrderedDict[int, Tuple]" = OrderedDict()
+        self._groups: Dict[Tuple[FrozenSet[str], Hashable], List[int]] = {}
+        self._by_chunk: Dict[str, Set[int]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, embedding: List[float], chunk_ids: Iterable[str], context_key: Hashable = None) -> Optional[Any]:
+        """Return the stored value of the most similar live entry over the same sources, or None"""
+        query = self._unit(embedding)
+        group_key = (frozenset(chunk_ids), context_key)
+        now = time.monotonic()
+
+        with self._lock:
+            best_id, best_similarity = None, self.similarity_threshold
+            for entry_id in list(self._groups.get(group_key, ())):
+                _, vector, _, expires_at = self._entries[entry_id]
+                if expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                similarity = float(vector @ query)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2]
+
+    def put(self, embedding: List[float], chunk_ids: Iterable[str], value: Any, context_key: Hashable = None):
+        """Store a value, evicting the least recently used entry when full"""
+        if self.maxsize <= 0:
+            return
+
+        chunk_ids = frozenset(chunk_ids)
+        group_key = (chunk_ids, context_key)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (group_key, self._unit(embedding), value, time.monotonic() + self.ttl_seconds)
+            self._groups.setdefault(group_key, []).append(entry_id)
+            for chunk_id in chunk_ids:
+                self._by_chunk.setdefault(chunk_id, set()).add(entry_id)
+
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, chunk_ids: Iterable[str]) -> int:
+        """Evict every entry built on any of these chunks, returning how many were dropped"""
+        with self._lock:
+            stale = set()
+            for chunk_id in chunk_ids:
+                stale.update(self._by_chunk.get(chunk_id, ()))
+            for entry_id in stale:
+                self._remove(entry_id)
+            return len(stale)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self._by_chunk.clear()
+
+    def get_stats(self) -> Dict:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
+
+    def _remove(self, entry_id: int):
+        """Drop one entry from every index (lock must be held)"""
+        group_key, _, _, _ = self._entries.pop(entry_id)
+        group = self._groups[group_key]
+        group.remove(entry_id)
+        if not group:
+            del self._groups[group_key]
+        for chunk_id in group_key[0]:
+            entries = self._by_chunk[chunk_id]
+            entries.discard(entry_id)
+            if not entries:
+                del self._by_chunk[chunk_id]
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -1,11 +1,15 @@
 import os
+import json
+import time
 import uuid
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
-from document_processor import DocumentProcessor
-from rag_system import RAGSystem
-from medical_llm import MedicalLLM
+from ingestion_jobs import IngestionJobQueue, JobQueueFullError
+from session_store import create_session_store
+from lazy_component import LazyComponent, warm_up
+from batch_chat import BatchChatRunner, parse_question, read_questions
+import metrics
 
 # Load environment variables
 load_dotenv()
@@ -21,22 +25,152 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(os.getenv('VECTOR_DB_PATH', './vector_db'), exist_ok=True)
 
-# Initialize components
-document_processor = DocumentProcessor()
-rag_system = RAGSystem()
-medical_llm = MedicalLLM()
+def _create_document_processor():
+    from document_processor import DocumentProcessor
+    return DocumentProcessor()
 
-# Store for session management
-sessions = {}
+def _create_rag_system():
+    from rag_system import RAGSystem
+    return RAGSystem()
+
+def _create_medical_llm():
+    from medical_llm import MedicalLLM
+    return MedicalLLM()
+
+def _create_ingestion_jobs():
+    return IngestionJobQueue(document_processor, rag_system)
+
+# Initialize components; langchain, torch and chromadb are only imported when
+# a component is first built, so importing this module is fast
+document_processor = LazyComponent('document processor', _create_document_processor)
+rag_system = LazyComponent('RAG system', _create_rag_system)
+medical_llm = LazyComponent('medical LLM', _create_medical_llm)
+components = {
+    'document_processor': document_processor,
+    'rag_system': rag_system,
+    'medical_llm': medical_llm
+}
+
+# Job queue and session store (in-memory LRU or SQLite shared across workers), built
+# on first use so the module-level app also works under `gunicorn app:app` or `flask run`
+ingestion_jobs = LazyComponent('ingestion job queue', _create_ingestion_jobs)
+sessions = LazyComponent('session store', create_session_store)
+
+# Started by create_app(). Importing this module must not start anything: spawned
+# PDF extraction workers re-import the launch script (python app.py / asgi.py)
+warmup_thread = None
+warmup_started = False
+
+def _warm_up_models():
+    """Run one query embedding (and rerank) so the first real request hits warm models"""
+    rag_system.embeddings.embed_query("warm up")
+    if rag_system.reranker is not None:
+        rag_system.reranker.warm_up()
+
+def create_app() -> Flask:
+    """Start the model warm-up once per server process and return the app"""
+    global warmup_thread, warmup_started
+    if warmup_started:
+        return app
+    warmup_started = True
+    
+    # WARMUP_MODE: 'background' loads models in a thread after startup, 'eager' loads
+    # them before the app is served, 'lazy' waits for the first request that needs them
+    warmup_mode = os.getenv('WARMUP_MODE', 'background').lower()
+    if warmup_mode == 'background':
+        warmup_thread = warm_up(list(components.values()), after=_warm_up_models)
+    elif warmup_mode == 'eager':
+        for component in components.values():
+            component.get()
+        _warm_up_models()
+    return app
+
+# Opt-in Server-Timing header with the stage breakdown, for requests sending X-Debug-Timing: 1
+debug_timing_enabled = os.getenv('DEBUG_TIMING_HEADER', 'false').lower() == 'true'
+
+def _cache_metrics():
+    """Cache counters, reported once the RAG system has been built"""
+    if not rag_system.ready:
+        return []
+    return metrics.cache_stats_lines(rag_system.get_cache_stats())
+
+metrics.registry.add_collector(_cache_metrics)
+
+@app.before_request
+def start_request_timing():
+    g.request_start = time.perf_counter()
+    if debug_timing_enabled and request.headers.get('X-Debug-Timing') == '1':
+        g.trace_token = metrics.start_trace()
+
+@app.after_request
+def finish_request_timing(response):
+    token = g.pop('trace_token', None)
+    if token is not None:
+        server_timing = metrics.finish_trace(token)
+        if server_timing:
+            response.headers['Server-Timing'] = server_timing
+    
+    start = g.pop('request_start', None)
+    if start is not None and request.url_rule is not None:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            endpoint=request.url_rule.rule,
+            method=request.method,
+            status=response.status_code
+        )
+    return response
+
+def take_over_request_timing():
+    """Hand the request's trace and latency timer to a streamed body.
+    
+    after_request runs before a streamed body is generated, so it skips requests that
+    call this. The returned function ends the trace and records the latency once, and
+    returns the Server-Timing value. It is also run when the response is closed, in case
+    the body was never consumed.
+    """
+    timing = {'trace_token': g.pop('trace_token', None), 'start': g.pop('request_start', None)}
+    endpoint, method = request.url_rule.rule, request.method
+    
+    def finish():
+        token, start = timing.pop('trace_token', None), timing.pop('start', None)
+        server_timing = metrics.finish_trace(token) if token is not None else None
+        if start is not None:
+            metrics.REQUEST_SECONDS.observe(
+                time.perf_counter() - start, endpoint=endpoint, method=method, status=200
+            )
+        return server_timing
+    
+    return finish
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of stage latencies and counters"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'message': 'Medical Chatbot API is running'
+        'message': 'Medical Chatbot API is running',
+        'ready': all(component.ready for component in components.values())
     })
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: models and the vector store are loaded"""
+    statuses = {name: component.status() for name, component in components.items()}
+    ready = all(status['ready'] for status in statuses.values())
+    return jsonify({
+        'status': 'ready' if ready else 'loading',
+        'components': statuses
+    }), 200 if ready else 503
+
 @app.route('/api/upload', methods=['POST'])
 def upload_document():
     """Upload and process medical documents"""
@@ -56,24 +190,41 @@ def upload_document():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         
-        # Process the document
-        text_chunks = document_processor.process_pdf(filepath)
-        
-        # Add to vector database
-        rag_system.add_documents(text_chunks, metadata={
-            'filename': file.filename,
-            'filepath': filepath
-        })
+        # Queue the document for background parsing, embedding and indexing
+        try:
+            job = ingestion_jobs.submit(filepath, file.filename)
+        except JobQueueFullError as e:
+            os.remove(filepath)
+            return jsonify({'error': str(e)}), 503
         
         return jsonify({
-            'message': 'Document uploaded and processed successfully',
+            'message': 'Document accepted for processing',
             'filename': file.filename,
-            'chunks_processed': len(text_chunks)
-        })
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'status_url': f"/api/jobs/{job['job_id']}"
+        }), 202
         
     except Exception as e:
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status and per-stage timings of an ingestion job"""
+    # LazyComponent.get() returns the queue; the queue's own get() looks up the job
+    job = ingestion_jobs.get().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/progress', methods=['GET'])
+def get_job_progress(job_id):
+    """Get the current stage and progress of an ingestion job"""
+    progress = ingestion_jobs.get_progress(job_id)
+    if progress is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(progress)
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Main chat endpoint with RAG"""
@@ -86,50 +237,205 @@ def chat():
         session_id = data.get('session_id', 'default')
         
         # Initialize session if needed
-        if session_id not in sessions:
-            sessions[session_id] = {
-                'history': [],
-                'context': []
-            }
+        session = get_session(session_id)
         
         # Retrieve relevant documents using RAG
         relevant_docs = rag_system.search_similar_documents(user_message, k=3)
         
-        # Generate response using medical LLM
-        response = medical_llm.generate_response(
-            user_message=user_message,
-            context_documents=relevant_docs,
-            chat_history=sessions[session_id]['history']
-        )
+        # Reuse the answer to a paraphrase of this question over the same sources
+        cached = rag_system.get_cached_answer(user_message, relevant_docs, session['history'])
+        if cached is not None:
+            response, usage = cached['response'], dict(cached['usage'], cached=True)
+        else:
+            # Generate response using medical LLM
+            usage = {}
+            response = medical_llm.generate_response(
+                user_message=user_message,
+                context_documents=relevant_docs,
+                chat_history=session['history'],
+                usage=usage
+            )
+            rag_system.cache_answer(user_message, relevant_docs, response, usage, session['history'])
         
         # Update session history
-        sessions[session_id]['history'].append({
-            'user': user_message,
-            'assistant': response
-        })
-        
-        # Keep only last 10 exchanges to manage memory
-        if len(sessions[session_id]['history']) > 10:
-            sessions[session_id]['history'] = sessions[session_id]['history'][-10:]
+        record_exchange(session_id, user_message, response)
         
         return jsonify({
             'response': response,
             'sources': [doc.metadata.get('filename', 'Unknown') for doc in relevant_docs],
-            'session_id': session_id
+            'session_id': session_id,
+            'usage': usage
         })
         
     except Exception as e:
+        metrics.ERRORS.inc(component='chat')
         return jsonify({'error': f'Chat failed: {str(e)}'}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat endpoint that streams the answer as Server-Sent Events"""
+    data = request.get_json()
+    if not data or 'message' not in data:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    user_message = data['message']
+    session_id = data.get('session_id', 'default')
+    finish_timing = take_over_request_timing()
+    
+    def generate():
+        try:
+            session = get_session(session_id)
+            
+            # Sources go out first so the client can render them while tokens arrive
+            relevant_docs = rag_system.search_similar_documents(user_message, k=3)
+            yield format_sse('sources', [doc.metadata.get('filename', 'Unknown') for doc in relevant_docs])
+            
+            parts = []
+            cached = rag_system.get_cached_answer(user_message, relevant_docs, session['history'])
+            if cached is not None:
+                usage = dict(cached['usage'], cached=True)
+                parts.append(cached['response'])
+                yield format_sse('token', {'text': cached['response']})
+            else:
+                usage = {}
+                for token in medical_llm.stream_response(
+                    user_message=user_message,
+                    context_documents=relevant_docs,
+                    chat_history=session['history'],
+                    usage=usage
+                ):
+                    parts.append(token)
+                    yield format_sse('token', {'text': token})
+                rag_system.cache_answer(user_message, relevant_docs, "".join(parts), usage, session['history'])
+            
+            # Update session history once the full answer is known
+            record_exchange(session_id, user_message, "".join(parts))
+            
+            # Headers are long gone, so the stage breakdown travels in the final event
+            done = {'session_id': session_id, 'usage': usage}
+            server_timing = finish_timing()
+            if server_timing:
+                done['server_timing'] = server_timing
+            yield format_sse('done', done)
+            
+        except Exception as e:
+            metrics.ERRORS.inc(component='chat')
+            yield format_sse('error', {'error': f'Chat failed: {str(e)}'})
+        finally:
+            finish_timing()
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(finish_timing)
+    return response
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer many stateless questions, streaming one JSON line per answer as it completes"""
+    try:
+        if request.mimetype == 'application/x-ndjson':
+            k = request.args.get('k', 3, type=int)
+            questions = list(read_questions(request.get_data(as_text=True).splitlines()))
+        else:
+            data = request.get_json()
+            if not data or not isinstance(data.get('questions'), list):
+                return jsonify({'error': 'questions list is required'}), 400
+            try:
+                k = int(data.get('k', 3))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'k must be an integer'}), 400
+            questions = [parse_question(entry, index) for index, entry in enumerate(data['questions'])]
+    except ValueError as e:
+        return jsonify({'error': f'Invalid questions: {str(e)}'}), 400
+    
+    max_questions = int(os.getenv('BATCH_MAX_QUESTIONS', 10000))
+    if len(questions) > max_questions:
+        return jsonify({'error': f'At most {max_questions} questions per batch'}), 413
+    
+    runner = BatchChatRunner(rag_system, medical_llm, k=min(max(1, k), 20))
+    finish_timing = take_over_request_timing()
+    
+    def generate():
+        try:
+            for result in runner.run(questions):
+                yield json.dumps(result) + "\n"
+        finally:
+            finish_timing()
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(finish_timing)
+    return response
+
+def format_sse(event: str, data) -> str:
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def get_session(session_id: str) -> dict:
+    """Return a snapshot of a session's history"""
+    return {
+        'history': sessions.get_history(session_id),
+        'context': []
+    }
+
+def record_exchange(session_id: str, user_message: str, response: str):
+    """Append an exchange to a session's history"""
+    sessions.append_exchange(session_id, user_message, response)
+
 @app.route('/api/documents', methods=['GET'])
 def list_documents():
-    """List all processed documents"""
+    """List processed documents, one page at a time"""
     try:
-        documents = rag_system.get_document_list()
-        return jsonify({'documents': documents})
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = min(max(1, request.args.get('limit', 100, type=int)), 1000)
+        
+        documents, total = rag_system.get_document_list(offset=offset, limit=limit)
+        return jsonify({
+            'documents': documents,
+            'total': total,
+            'offset': offset,
+            'limit': limit
+        })
     except Exception as e:
         return jsonify({'error': f'Failed to list documents: {str(e)}'}), 500
 
+@app.route('/api/documents/<path:filename>', methods=['GET'])
+def get_document(filename):
+    """Get one document's chunk count, type and chunk IDs"""
+    try:
+        document = rag_system.document_catalog.get(filename)
+        if document is None:
+            return jsonify({'error': 'Document not found'}), 404
+        document['chunk_ids'] = rag_system.document_catalog.chunk_ids(filename)
+        return jsonify(document)
+    except Exception as e:
+        return jsonify({'error': f'Failed to get document: {str(e)}'}), 500
+
+@app.route('/api/documents/<path:filename>', methods=['DELETE'])
+def delete_document(filename):
+    """Delete a document and all of its chunks"""
+    try:
+        deleted = rag_system.delete_document(filename)
+        if deleted == 0:
+            return jsonify({'error': 'Document not found'}), 404
+        return jsonify({'message': 'Document deleted successfully', 'filename': filename, 'chunks_deleted': deleted})
+    except Exception as e:
+        return jsonify({'error': f'Failed to delete document: {str(e)}'}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Cache and embedding throughput statistics"""
+    try:
+        return jsonify({
+            'caches': rag_system.get_cache_stats(),
+            'embedding_engine': rag_system.embedding_engine.get_stats(),
+            'reranker': rag_system.reranker.get_stats() if rag_system.reranker else None
+        })
+    except Exception as e:
+        return jsonify({'error': f'Failed to get stats: {str(e)}'}), 500
+
 @app.route('/api/clear_session', methods=['POST'])
 def clear_session():
     """Clear chat session"""
@@ -137,8 +443,7 @@ def clear_session():
         data = request.get_json()
         session_id = data.get('session_id', 'default')
         
-        if session_id in sessions:
-            sessions[session_id] = {'history': [], 'context': []}
+        sessions.clear(session_id)
         
         return jsonify({'message': 'Session cleared successfully'})
     except Exception as e:
@@ -147,4 +452,4 @@ def clear_session():
 if __name__ == '__main__':
     print("Starting Medical Chatbot API...")
     print("Make sure to set your OPENAI_API_KEY in the .env file")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
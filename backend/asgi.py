@@ -0,0 +1,262 @@
+import os
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+import metrics
+from app import app as flask_app, create_app as create_flask_app, rag_system, medical_llm, get_session, record_exchange, format_sse, debug_timing_enabled
+
+# Async serving mode: chat endpoints run on the event loop so a request waiting on
+# the LLM does not pin a thread. Every other route is served by the Flask app.
+#
+#   uvicorn asgi:create_app --factory --host 0.0.0.0 --port 5000
+
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('REQUEST_TIMEOUT_SECONDS', 90))
+
+# Retrieval is CPU-bound (query embedding + vector search) and runs in a small pool
+retrieval_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('RETRIEVAL_WORKERS', 4)),
+    thread_name_prefix='retrieval'
+)
+
+# Bounded concurrency per upstream, so a burst of chats cannot overrun a provider
+UPSTREAM_MAX_CONCURRENCY = {
+    'retrieval': int(os.getenv('RETRIEVAL_MAX_CONCURRENCY', 16)),
+    'llm': int(os.getenv('LLM_MAX_CONCURRENCY', 64))
+}
+upstream_limits = {}
+
+
+def upstream_limit(name: str) -> asyncio.Semaphore:
+    """Semaphore bounding one upstream, created inside the server's running loop"""
+    # Before Python 3.10 a Semaphore binds to the event loop current when it is created,
+    # so one created at import would not belong to uvicorn's loop
+    limit = upstream_limits.get(name)
+    if limit is None:
+        limit = upstream_limits[name] = asyncio.Semaphore(UPSTREAM_MAX_CONCURRENCY[name])
+    return limit
+
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-Debug-Timing',
+    'Access-Control-Expose-Headers': 'Server-Timing'
+}
+
+
+def with_cors(endpoint):
+    """Answer CORS preflights and tag responses, matching flask_cors defaults"""
+    @functools.wraps(endpoint)
+    async def wrapper(request: Request):
+        if request.method == 'OPTIONS':
+            return Response(status_code=204, headers=CORS_HEADERS)
+        response = await endpoint(request)
+        response.headers.update(CORS_HEADERS)
+        return response
+    return wrapper
+
+
+async def retrieve(user_message: str, k: int = 3):
+    """Run retrieval in the executor without blocking the event loop"""
+    async with upstream_limit('retrieval'):
+        loop = asyncio.get_running_loop()
+        # Resolved inside the executor, so a first call that loads the model does not block the loop;
+        # the copied context carries any debug trace into the worker thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            retrieval_executor, context.run, lambda: rag_system.search_similar_documents(user_message, k)
+        )
+
+
+async def cached_answer(user_message: str, relevant_docs, chat_history):
+    """Look up the answer cache in the executor, since it may embed the query"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        retrieval_executor, context.run,
+        lambda: rag_system.get_cached_answer(user_message, relevant_docs, chat_history)
+    )
+
+
+async def store_answer(user_message: str, relevant_docs, response: str, usage, chat_history):
+    """Store a finished answer in the answer cache from the executor"""
+    await asyncio.get_running_loop().run_in_executor(
+        retrieval_executor,
+        lambda: rag_system.cache_answer(user_message, relevant_docs, response, usage, chat_history)
+    )
+
+
+async def load_session(session_id: str):
+    """Read a session from the store (in memory or SQLite) off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(None, get_session, session_id)
+
+
+async def save_exchange(session_id: str, user_message: str, response: str):
+    """Append a finished exchange to the session store off the event loop"""
+    await asyncio.get_running_loop().run_in_executor(None, record_exchange, session_id, user_message, response)
+
+
+async def loaded_llm():
+    """The medical LLM, loading it off the event loop if warm-up has not finished"""
+    if not medical_llm.ready:
+        await asyncio.get_running_loop().run_in_executor(retrieval_executor, medical_llm.get)
+    return medical_llm.get()
+
+
+async def _read_chat_request(request: Request):
+    """Parse a chat request body into (message, session_id, error_response)"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+
+    if not data or 'message' not in data:
+        return None, None, JSONResponse({'error': 'Message is required'}, status_code=400)
+
+    return data['message'], data.get('session_id', 'default'), None
+
+
+@with_cors
+async def chat(request: Request):
+    """Async chat endpoint with RAG"""
+    user_message, session_id, error = await _read_chat_request(request)
+    if error:
+        return error
+
+    async def answer():
+        session = await load_session(session_id)
+        relevant_docs = await retrieve(user_message, k=3)
+
+        cached = await cached_answer(user_message, relevant_docs, session['history'])
+        if cached is not None:
+            await save_exchange(session_id, user_message, cached['response'])
+            return cached['response'], relevant_docs, dict(cached['usage'], cached=True)
+
+        usage = {}
+        llm = await loaded_llm()
+        async with upstream_limit('llm'):
+            response = await llm.agenerate_response(
+                user_message=user_message,
+                context_documents=relevant_docs,
+                chat_history=session['history'],
+                usage=usage
+            )
+        await store_answer(user_message, relevant_docs, response, usage, session['history'])
+
+        await save_exchange(session_id, user_message, response)
+        return response, relevant_docs, usage
+
+    trace_token = None
+    if debug_timing_enabled and request.headers.get('X-Debug-Timing') == '1':
+        trace_token = metrics.start_trace()
+
+    try:
+        # answer() runs as a task in a copy of this context, so the trace list is shared
+        response, relevant_docs, usage = await asyncio.wait_for(answer(), timeout=REQUEST_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        metrics.ERRORS.inc(component='chat')
+        return JSONResponse({'error': 'Chat timed out'}, status_code=504)
+    except Exception as e:
+        metrics.ERRORS.inc(component='chat')
+        return JSONResponse({'error': f'Chat failed: {str(e)}'}, status_code=500)
+    finally:
+        server_timing = metrics.finish_trace(trace_token) if trace_token is not None else None
+
+    headers = {'Server-Timing': server_timing} if server_timing else None
+    return JSONResponse({
+        'response': response,
+        'sources': [doc.metadata.get('filename', 'Unknown') for doc in relevant_docs],
+        'session_id': session_id,
+        'usage': usage
+    }, headers=headers)
+
+
+@with_cors
+async def chat_stream(request: Request):
+    """Async chat endpoint that streams the answer as Server-Sent Events"""
+    user_message, session_id, error = await _read_chat_request(request)
+    if error:
+        return error
+
+    async def generate():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + REQUEST_TIMEOUT_SECONDS
+        try:
+            session = await load_session(session_id)
+
+            relevant_docs = await asyncio.wait_for(
+                retrieve(user_message, k=3), timeout=deadline - loop.time()
+            )
+            yield format_sse('sources', [doc.metadata.get('filename', 'Unknown') for doc in relevant_docs])
+
+            parts = []
+            cached = await cached_answer(user_message, relevant_docs, session['history'])
+            if cached is not None:
+                usage = dict(cached['usage'], cached=True)
+                parts.append(cached['response'])
+                yield format_sse('token', {'text': cached['response']})
+            else:
+                usage = {}
+                llm = await loaded_llm()
+                async with upstream_limit('llm'):
+                    tokens = llm.astream_response(
+                        user_message=user_message,
+                        context_documents=relevant_docs,
+                        chat_history=session['history'],
+                        usage=usage
+                    )
+                    try:
+                        while True:
+                            # A stalled upstream times out even if no further token arrives
+                            try:
+                                token = await asyncio.wait_for(tokens.__anext__(), timeout=deadline - loop.time())
+                            except StopAsyncIteration:
+                                break
+                            parts.append(token)
+                            yield format_sse('token', {'text': token})
+                    finally:
+                        # Ends the upstream request on timeout or when the client goes away
+                        await tokens.aclose()
+                await store_answer(user_message, relevant_docs, "".join(parts), usage, session['history'])
+
+            await save_exchange(session_id, user_message, "".join(parts))
+            yield format_sse('done', {'session_id': session_id, 'usage': usage})
+
+        except asyncio.TimeoutError:
+            metrics.ERRORS.inc(component='chat')
+            yield format_sse('error', {'error': 'Chat timed out'})
+        except Exception as e:
+            metrics.ERRORS.inc(component='chat')
+            yield format_sse('error', {'error': f'Chat failed: {str(e)}'})
+
+    return StreamingResponse(
+        generate(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+app = Starlette(routes=[
+    Route('/api/chat', chat, methods=['POST', 'OPTIONS']),
+    Route('/api/chat/stream', chat_stream, methods=['POST', 'OPTIONS']),
+    Mount('/', WSGIMiddleware(flask_app))
+])
+
+
+def create_app() -> Starlette:
+    """Start the Flask app's job queue, session store and warm-up, and return the ASGI app"""
+    create_flask_app()
+    return app
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("Starting Medical Chatbot API (async mode)...")
+    uvicorn.run(create_app(), host='0.0.0.0', port=5000)
@@ -0,0 +1,176 @@
+"""Batch question answering for offline evaluation and bulk runs.
+
+Questions are retrieved in groups with one embedding pass and one vector store
+query per group, then answered by a thread pool with bounded LLM concurrency
+and retry/backoff. Results are emitted as JSON lines as they complete.
+
+    cd backend
+    python batch_chat.py questions.jsonl -o answers.jsonl --concurrency 16
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List
+from dotenv import load_dotenv
+
+
+def parse_question(entry, index: int) -> Dict:
+    """Normalize one question: a string, or an object with a message (or question) and an optional id"""
+    if isinstance(entry, str):
+        entry = {'message': entry}
+    if not isinstance(entry, dict):
+        raise ValueError(f"Question {index} must be a string or an object")
+
+    message = entry.get('message', entry.get('question'))
+    if not isinstance(message, str) or not message.strip():
+        raise ValueError(f"Question {index} has no message")
+    return {'index': index, 'id': entry.get('id', index), 'message': message}
+
+
+def read_questions(lines: Iterable[str]) -> Iterator[Dict]:
+    """Questions from JSON lines (objects or strings) or plain lines, one per line"""
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        entry = json.loads(line) if line[0] in '{"' else line
+        yield parse_question(entry, index)
+        index += 1
+
+
+class BatchChatRunner:
+    """Answers many stateless questions with batched retrieval and concurrent LLM calls"""
+
+    def __init__(self, rag_system, medical_llm, concurrency: int = None, max_attempts: int = None,
+                 backoff_seconds: float = None, retrieval_batch_size: int = None, k: int = 3):
+        self.rag_system = rag_system
+        self.medical_llm = medical_llm
+        self.concurrency = concurrency or int(os.getenv('BATCH_LLM_CONCURRENCY', 8))
+        self.max_attempts = max_attempts or int(os.getenv('BATCH_LLM_MAX_ATTEMPTS', 3))
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else float(os.getenv('BATCH_LLM_BACKOFF_SECONDS', 1.0))
+        self.retrieval_batch_size = retrieval_batch_size or int(os.getenv('BATCH_RETRIEVAL_SIZE', 64))
+        self.k = k
+
+    def run(self, questions: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield one result per question, in completion order (each carries its input index)"""
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='batch-llm')
+        in_flight = set()
+        try:
+            for group in self._groups(questions):
+                # One embedding pass and one vector store query for the whole group
+                retrieved = self.rag_system.search_batch([question['message'] for question in group], k=self.k)
+
+                for question, documents in zip(group, retrieved):
+                    # Keep a bounded number of answers queued behind the LLM workers
+                    while len(in_flight) >= self.concurrency * 2:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                    in_flight.add(executor.submit(self._answer, question, documents))
+
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # Drop answers still queued (shutdown's cancel_futures needs Python 3.9)
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _groups(self, questions: Iterable[Dict]) -> Iterator[List[Dict]]:
+        group = []
+        for question in questions:
+            group.append(question)
+            if len(group) >= self.retrieval_batch_size:
+                yield group
+                group = []
+        if group:
+            yield group
+
+    def _answer(self, question: Dict, documents: List) -> Dict:
+        """Answer one question, reusing the answer cache when enabled"""
+        start = time.perf_counter()
+        result = dict(question, sources=[doc.metadata.get('filename', 'Unknown') for doc in documents])
+        try:
+            cached = self.rag_system.get_cached_answer(question['message'], documents)
+            if cached is not None:
+                response, usage = cached['response'], dict(cached['usage'], cached=True)
+            else:
+                usage = {}
+                response = self.medical_llm.generate_response(
+                    user_message=question['message'],
+                    context_documents=documents,
+                    usage=usage,
+                    max_attempts=self.max_attempts,
+                    backoff_seconds=self.backoff_seconds
+                )
+                self.rag_system.cache_answer(question['message'], documents, response, usage)
+            result.update(response=response, usage=usage)
+            # generate_response does not raise once retries run out; it returns the document-only fallback
+            if usage.get('fallback') == 'llm_error':
+                result['error'] = f"LLM call failed after {self.max_attempts} attempts; fallback answer returned"
+        except Exception as e:
+            result['error'] = str(e)
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Answer a file of questions through the RAG pipeline')
+    parser.add_argument('questions', help='JSON lines ({"id": ..., "message": ...} or strings) or one question per line; - for stdin')
+    parser.add_argument('-o', '--output', help='JSON lines output file (default: stdout)')
+    parser.add_argument('--concurrency', type=int, help='concurrent LLM calls (default: BATCH_LLM_CONCURRENCY or 8)')
+    parser.add_argument('--max-attempts', type=int, help='LLM attempts per question (default: BATCH_LLM_MAX_ATTEMPTS or 3)')
+    parser.add_argument('--retrieval-batch', type=int, help='questions per retrieval batch (default: BATCH_RETRIEVAL_SIZE or 64)')
+    parser.add_argument('-k', type=int, default=3, help='documents retrieved per question')
+    parser.add_argument('--ordered', action='store_true', help='write results in input order instead of completion order')
+    args = parser.parse_args()
+
+    load_dotenv()
+    os.makedirs(os.getenv('VECTOR_DB_PATH', './vector_db'), exist_ok=True)
+
+    from rag_system import RAGSystem
+    from medical_llm import MedicalLLM
+    runner = BatchChatRunner(
+        RAGSystem(), MedicalLLM(),
+        concurrency=args.concurrency,
+        max_attempts=args.max_attempts,
+        retrieval_batch_size=args.retrieval_batch,
+        k=args.k
+    )
+
+    source = sys.stdin if args.questions == '-' else open(args.questions)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    start = time.perf_counter()
+    answered = failed = 0
+    try:
+        results = runner.run(read_questions(source))
+        if args.ordered:
+            results = sorted(results, key=lambda result: result['index'])
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            answered += 1
+            failed += 'error' in result
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Answered {answered} questions ({failed} failed) in {elapsed:.1f}s "
+        f"({answered / elapsed if elapsed else 0:.2f} questions/s)",
+        file=sys.stderr
+    )
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
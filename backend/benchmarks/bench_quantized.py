@@ -0,0 +1,161 @@
+"""Footprint, recall and latency of the int8 vector index against exact float32 search.
+
+Vectors are synthetic unit vectors drawn around topic centroids, which is
+closer to real chunk embeddings than isotropic noise; queries are perturbed
+copies of stored vectors.
+
+Int8 search runs next to the Chroma collection, which still stores every chunk's
+float32 embedding and keeps its own HNSW graph in memory. The same vectors are
+therefore also written to a Chroma collection, and its resident size is measured
+in a fresh process, so the reported total is what a deployment actually holds.
+
+    cd backend
+    python benchmarks/bench_quantized.py --chunks 100000 --queries 500 --k 10
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+from typing import List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ann_index import Int8ANNIndex, normalize_rows
+from run_benchmarks import percentiles
+
+
+def synthetic_embeddings(rng, count: int, dim: int, topics: int = 200) -> np.ndarray:
+    centroids = normalize_rows(rng.standard_normal((topics, dim)))
+    assignments = rng.integers(0, topics, count)
+    return normalize_rows(centroids[assignments] + 0.6 * normalize_rows(rng.standard_normal((count, dim))))
+
+
+def resident_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _build_chroma(path: str, vectors_file: str):
+    import chromadb
+    vectors = np.load(vectors_file)
+    collection = chromadb.PersistentClient(path=path).get_or_create_collection('bench')
+    for start in range(0, len(vectors), 5000):
+        batch = vectors[start:start + 5000]
+        collection.add(ids=[str(start + i) for i in range(len(batch))], embeddings=batch.tolist())
+
+
+def _measure_chroma(path: str, query: List[float], result):
+    import chromadb
+    collection = chromadb.PersistentClient(path=path).get_collection('bench')
+    before = resident_bytes()
+    collection.query(query_embeddings=[query], n_results=1)  # loads the HNSW segment
+    after = resident_bytes()
+    result.put(None if before is None or after is None else after - before)
+
+
+def chroma_footprint(workdir: str, vectors: np.ndarray) -> Tuple[Optional[float], float]:
+    """(resident, on-disk) bytes per chunk of a Chroma collection holding the vectors"""
+    path = os.path.join(workdir, 'chroma')
+    vectors_file = os.path.join(workdir, 'vectors.npy')
+    np.save(vectors_file, vectors)
+    # Build and measure in separate fresh processes so neither sees the other's caches
+    context = multiprocessing.get_context('spawn')
+    builder = context.Process(target=_build_chroma, args=(path, vectors_file))
+    builder.start()
+    builder.join()
+
+    result = context.Queue()
+    measurer = context.Process(target=_measure_chroma, args=(path, vectors[0].tolist(), result))
+    measurer.start()
+    resident = result.get()
+    measurer.join()
+
+    disk = sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+    count = len(vectors)
+    return (None if resident is None else resident / count), disk / count
+
+
+def evaluate(search, queries: np.ndarray, truth: np.ndarray, k: int):
+    """Recall@k against the exact top-k and per-query latency samples"""
+    hits = 0
+    samples = []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search(query)
+        samples.append(time.perf_counter() - start)
+        hits += len(set(found) & set(expected.tolist()))
+    return hits / (len(queries) * k), percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark int8 quantized vector search')
+    parser.add_argument('--chunks', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--rerank-factors', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--skip-chroma', action='store_true', help='do not measure the Chroma collection')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = synthetic_embeddings(rng, args.chunks, args.dim)
+    picks = rng.integers(0, args.chunks, args.queries)
+    queries = normalize_rows(vectors[picks] + 0.5 * normalize_rows(rng.standard_normal((args.queries, args.dim))))
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, k={args.k}")
+    recall, latency = evaluate(
+        lambda query: np.argpartition(-(vectors @ query), args.k)[:args.k].tolist(), queries, truth, args.k
+    )
+    print(f"  float32 exact        {4 * args.dim:7.1f} B/chunk  recall@k {recall:.4f}  "
+          f"p50 {latency['p50_ms']:7.2f} ms  p95 {latency['p95_ms']:7.2f} ms")
+
+    workdir = tempfile.mkdtemp(prefix='medbot-int8-')
+    try:
+        index = Int8ANNIndex(os.path.join(workdir, 'ann_int8.codes'), args.dim)
+        ids = [str(i) for i in range(args.chunks)]
+        for start in range(0, args.chunks, 10000):
+            index.add(ids[start:start + 10000], vectors[start:start + 10000])
+        index.save()
+
+        for factor in args.rerank_factors:
+            index.rerank_factor = factor
+            recall, latency = evaluate(
+                lambda query: [int(chunk_id) for chunk_id, _ in index.search(query, args.k)], queries, truth, args.k
+            )
+            print(f"  int8 rerank x{factor:<3}     {index.memory_bytes_per_vector():7.1f} B/chunk  recall@k {recall:.4f}  "
+                  f"p50 {latency['p50_ms']:7.2f} ms  p95 {latency['p95_ms']:7.2f} ms")
+
+        print("  (int8 B/chunk is the scanned codes and scale plus the row maps and chunk ID dicts;")
+        print("   the float32 copy used to re-rank stays on disk and only candidate rows are paged in)")
+
+        if not args.skip_chroma:
+            resident, disk = chroma_footprint(workdir, vectors)
+            int8_disk = args.dim + 4 + 4 * args.dim
+            if resident is None:
+                print(f"  chroma collection    resident size unavailable (no /proc), {disk:.1f} B/chunk on disk")
+            else:
+                total = index.memory_bytes_per_vector() + resident
+                print(f"  chroma collection    {resident:7.1f} B/chunk resident, {disk:.1f} B/chunk on disk")
+                print(f"  total with int8      {total:7.1f} B/chunk resident, {disk + int8_disk:.1f} B/chunk on disk")
+            print("  (Chroma keeps every float32 embedding and its HNSW graph whatever ANN_BACKEND is,")
+            print("   so int8 adds to the collection's memory rather than replacing it)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
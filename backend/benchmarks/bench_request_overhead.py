@@ -0,0 +1,133 @@
+"""Micro-benchmark of per-request CPU overhead in MedicalLLM and DocumentProcessor.
+
+Compares the precompiled prompt template and keyword matchers with the previous
+approach (rebuilding the ChatPromptTemplate and keyword lists on every call),
+and checks that both give identical results.
+
+    cd backend
+    python benchmarks/bench_request_overhead.py --iterations 2000
+"""
+import os
+import sys
+import copy
+import random
+import itertools
+import timeit
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import generate_page_text, generate_queries
+
+
+def legacy_classify_urgency(message: str) -> str:
+    urgent_keywords = [
+        'emergency', 'urgent', 'severe pain', 'chest pain', 'difficulty breathing',
+        'unconscious', 'bleeding', 'stroke', 'heart attack', 'overdose', 'poisoning'
+    ]
+    message_lower = message.lower()
+    if any(keyword in message_lower for keyword in urgent_keywords):
+        return "urgent"
+    elif any(word in message_lower for word in ['pain', 'symptoms', 'side effects']):
+        return "moderate"
+    else:
+        return "routine"
+
+
+def legacy_extract_entities(text: str) -> dict:
+    medical_keywords = {
+        'medications': ['mg', 'ml', 'tablet', 'capsule', 'dose', 'medication', 'drug'],
+        'conditions': ['diagnosis', 'syndrome', 'disease', 'disorder', 'infection'],
+        'procedures': ['surgery', 'procedure', 'treatment', 'therapy', 'intervention'],
+        'lab_values': ['level', 'count', 'result', 'test', 'lab', 'blood', 'urine']
+    }
+    entities = {}
+    text_lower = text.lower()
+    for category, keywords in medical_keywords.items():
+        found_keywords = [kw for kw in keywords if kw in text_lower]
+        if found_keywords:
+            entities[category] = found_keywords
+    return entities
+
+
+def legacy_format_messages(system_prompt: str, template: str, **fields):
+    from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessagePromptTemplate.from_template(system_prompt),
+        HumanMessagePromptTemplate.from_template(template)
+    ])
+    return prompt.format_messages(**fields)
+
+
+def per_call_us(function, iterations: int) -> float:
+    return min(timeit.repeat(function, number=iterations, repeat=3)) / iterations * 1e6
+
+
+def report(name: str, before: float, after: float):
+    print(f"  {name:<24} before {before:9.2f} us   after {after:9.2f} us   ({before / after:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-request prompt and keyword overhead')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    os.environ.setdefault('LLM_PROVIDER', 'fake')
+    from medical_llm import MedicalLLM, HUMAN_PROMPT_TEMPLATE
+    from document_processor import DocumentProcessor, MEDICAL_ENTITY_MATCHER
+
+    rng = random.Random(args.seed)
+    queries = generate_queries(rng, 200) + ["severe chest pain and difficulty breathing", "side effects?"]
+    chunks = [generate_page_text(rng, 8) for _ in range(200)]
+
+    medical_llm = MedicalLLM()
+    document_processor = DocumentProcessor()
+
+    # The new code paths must agree with the old ones
+    for text in queries + chunks:
+        assert medical_llm.classify_medical_urgency(text) == legacy_classify_urgency(text), text
+        assert document_processor.extract_medical_entities(text) == legacy_extract_entities(text), text
+
+    fields = {'context': chunks[0], 'history': 'No previous conversation.', 'question': queries[0]}
+    assert medical_llm.prompt.format_messages(**fields) == legacy_format_messages(
+        medical_llm.system_prompt, HUMAN_PROMPT_TEMPLATE, **fields
+    )
+
+    query_cycle = itertools.cycle(queries)
+    chunk_cycle = itertools.cycle(chunks)
+
+    print(f"Per-call cost over {args.iterations} iterations (best of 3):")
+    report(
+        'prompt template',
+        per_call_us(lambda: legacy_format_messages(medical_llm.system_prompt, HUMAN_PROMPT_TEMPLATE, **fields), args.iterations),
+        per_call_us(lambda: medical_llm.prompt.format_messages(**fields), args.iterations)
+    )
+    report(
+        'classify urgency',
+        per_call_us(lambda: legacy_classify_urgency(next(query_cycle)), args.iterations),
+        per_call_us(lambda: medical_llm.classify_medical_urgency(next(query_cycle)), args.iterations)
+    )
+    report(
+        'extract entities',
+        per_call_us(lambda: legacy_extract_entities(next(chunk_cycle)), args.iterations),
+        per_call_us(lambda: document_processor.extract_medical_entities(next(chunk_cycle)), args.iterations)
+    )
+
+    if MEDICAL_ENTITY_MATCHER._automaton is not None:
+        # What deployments without pyahocorasick get
+        scan_matcher = copy.copy(MEDICAL_ENTITY_MATCHER)
+        scan_matcher._automaton = None
+        report(
+            'extract entities (scan)',
+            per_call_us(lambda: legacy_extract_entities(next(chunk_cycle)), args.iterations),
+            per_call_us(lambda: scan_matcher.find(next(chunk_cycle).lower()), args.iterations)
+        )
+    else:
+        print("  pyahocorasick is not installed; keyword matching uses precompiled `in` scans")
+
+
+if __name__ == '__main__':
+    main()
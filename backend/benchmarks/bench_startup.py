@@ -0,0 +1,64 @@
+"""Measure worker startup: time to import the app and time until models are loaded.
+
+Each run starts a fresh interpreter, as a new gunicorn worker would.
+
+    cd backend
+    python benchmarks/bench_startup.py --runs 3
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+app.create_app()
+imported = time.perf_counter() - start
+if app.warmup_thread is not None:
+    app.warmup_thread.join()
+for component in app.components.values():
+    component.get()
+ready = time.perf_counter() - start
+print(json.dumps({'import_seconds': imported, 'ready_seconds': ready}))
+"""
+
+
+def measure(mode: str, runs: int) -> dict:
+    """Median import and ready times over fresh processes for one WARMUP_MODE"""
+    env = dict(os.environ, WARMUP_MODE=mode)
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        key: round(statistics.median(sample[key] for sample in samples), 3)
+        for key in ('import_seconds', 'ready_seconds')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark backend worker startup')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--modes', nargs='+', default=['eager', 'background', 'lazy'])
+    args = parser.parse_args()
+
+    os.environ.setdefault('LLM_PROVIDER', 'fake')
+    os.environ.setdefault('ANONYMIZED_TELEMETRY', 'False')
+
+    for mode in args.modes:
+        result = measure(mode, args.runs)
+        print(f"  WARMUP_MODE={mode:<10} import {result['import_seconds']:6.2f}s   ready {result['ready_seconds']:6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark of DocumentProcessor text cleaning and chunking on multi-megabyte text.
+
+Compares the single-pass _clean_text/_split_text with the previous approach (four
+regex passes followed by RecursiveCharacterTextSplitter.split_text), and checks
+that both produce exactly the same chunks, for the whole text and page by page.
+
+    cd backend
+    python benchmarks/bench_text_cleaning.py --megabytes 4
+"""
+import os
+import re
+import sys
+import random
+import timeit
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import generate_page_text
+
+# Layout noise of the kind PDF extraction leaves behind
+NOISE = ['• ', '°C', ' ≤ ', '\t', '  ', ' ,', ' .', ' ', '–', 'é', '* ']
+
+
+def legacy_clean_text(text: str) -> str:
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s\.\,\;\:\!\?\-\(\)\[\]]', ' ', text)
+    text = re.sub(r'\s*\.\s*', '. ', text)
+    text = re.sub(r'\s*\,\s*', ', ', text)
+    return text.strip()
+
+
+def generate_pages(rng: random.Random, megabytes: float):
+    """Synthetic pages with line wraps and extraction noise, totalling about the given size"""
+    pages = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        words = generate_page_text(rng).split(' ')
+        for _ in range(len(words) // 15):
+            position = rng.randrange(len(words))
+            words[position] += rng.choice(NOISE)
+        page = ' '.join(words).replace('; ', ';\n', 3)
+        pages.append(page)
+        size += len(page)
+    return pages
+
+
+def best_seconds(function, repeat: int) -> float:
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def report(name: str, before: float, after: float):
+    print(f"  {name:<8} before {before * 1000:9.1f} ms   after {after * 1000:9.1f} ms   ({before / after:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark text cleaning and chunking')
+    parser.add_argument('--megabytes', type=float, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    from document_processor import DocumentProcessor
+
+    rng = random.Random(args.seed)
+    pages = generate_pages(rng, args.megabytes)
+    text = "\n\n".join(pages)
+    document_processor = DocumentProcessor()
+    splitter = document_processor.text_splitter
+
+    # The new code paths must produce the same chunks as the old ones
+    legacy_cleaned = legacy_clean_text(text)
+    cleaned = document_processor._clean_text(text)
+    assert cleaned == legacy_cleaned
+    assert document_processor._split_text(cleaned) == splitter.split_text(legacy_cleaned)
+    for page in pages:
+        assert document_processor._split_text(document_processor._clean_text(page)) == \
+            splitter.split_text(legacy_clean_text(page))
+
+    print(f"{len(text) / 1024 / 1024:.1f} MB in {len(pages)} pages, "
+          f"chunk size {document_processor.chunk_size}, overlap {document_processor.chunk_overlap} "
+          f"(best of {args.repeat}):")
+    clean_before = best_seconds(lambda: legacy_clean_text(text), args.repeat)
+    clean_after = best_seconds(lambda: document_processor._clean_text(text), args.repeat)
+    split_before = best_seconds(lambda: splitter.split_text(legacy_cleaned), args.repeat)
+    split_after = best_seconds(lambda: document_processor._split_text(cleaned), args.repeat)
+    report('clean', clean_before, clean_after)
+    report('split', split_before, split_after)
+    report('total', clean_before + split_before, clean_after + split_after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""Offline benchmark for the ingest and chat hot paths.
+
+Generates synthetic medical PDFs, ingests them into a throwaway vector store
+and replays distinct questions through retrieval and /api/chat with the fake
+LLM backend, so no network access or API key is needed.
+
+    cd backend
+    python benchmarks/run_benchmarks.py --pages 10 100 --output bench.json
+    python benchmarks/run_benchmarks.py --compare bench.json --output bench2.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import generate_queries, write_synthetic_pdf
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of latency samples, in milliseconds"""
+    if not samples:
+        return {}
+
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000
+
+    return {
+        'p50_ms': round(pick(0.50), 3),
+        'p95_ms': round(pick(0.95), 3),
+        'p99_ms': round(pick(0.99), 3),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'count': len(ordered)
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def configure_environment(args, workdir: str):
+    """Point every component at the scratch directory before it is imported"""
+    os.environ['VECTOR_DB_PATH'] = os.path.join(workdir, 'vector_db')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    os.environ['LLM_PROVIDER'] = 'fake'
+    os.environ['FAKE_LLM_FIRST_TOKEN_DELAY'] = str(args.llm_latency)
+    os.environ['FAKE_LLM_TOKEN_DELAY'] = str(args.token_delay)
+    os.environ['FAKE_LLM_TOKENS'] = str(args.llm_tokens)
+    os.environ.setdefault('ANONYMIZED_TELEMETRY', 'False')
+    # Every benchmark query must exercise the full retrieval path
+    os.environ['RETRIEVAL_CACHE_SIZE'] = '0'
+    os.environ['QUERY_EMBEDDING_CACHE_SIZE'] = '0'
+    if args.no_embedding_cache:
+        os.environ['EMBEDDING_CACHE_ENABLED'] = 'false'
+
+
+def bench_ingest(document_processor, rag_system, pdf_paths: Dict[int, str]) -> Dict:
+    """Time PDF processing and indexing for each document size"""
+    results = {}
+    for num_pages, path in pdf_paths.items():
+        start = time.perf_counter()
+        chunks = document_processor.process_pdf(path)
+        process_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rag_system.add_documents(chunks, metadata={'filename': os.path.basename(path), 'filepath': path})
+        index_seconds = time.perf_counter() - start
+
+        results[f'{num_pages}_pages'] = {
+            'pages': num_pages,
+            'chunks': len(chunks),
+            'process_pdf_seconds': round(process_seconds, 4),
+            'pages_per_second': round(num_pages / process_seconds, 2) if process_seconds else None,
+            'add_documents_seconds': round(index_seconds, 4),
+            'chunks_per_second': round(len(chunks) / index_seconds, 2) if index_seconds else None,
+            'peak_rss_mb': peak_rss_mb()
+        }
+        print(f"  {num_pages:>5} pages: {results[f'{num_pages}_pages']}")
+    return results
+
+
+def bench_retrieval(rag_system, queries: List[str], k: int) -> Dict:
+    """Latency of search_similar_documents over distinct queries"""
+    rag_system.search_similar_documents(queries[0], k=k)  # warm-up
+
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        rag_system.search_similar_documents(query, k=k)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def bench_chat(flask_app, queries: List[str]) -> Dict:
+    """End-to-end /api/chat latency through the Flask test client"""
+    client = flask_app.test_client()
+    samples = []
+    errors = 0
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        response = client.post('/api/chat', json={'message': query, 'session_id': f'bench-{i % 8}'})
+        samples.append(time.perf_counter() - start)
+        errors += response.status_code != 200
+
+    result = percentiles(samples)
+    result['errors'] = errors
+    return result
+
+
+def compare(previous: Dict, current: Dict, prefix: str = '') -> List[str]:
+    """Report relative changes between two result trees"""
+    lines = []
+    for key, value in current.items():
+        if key not in previous or key in ('config', 'count'):
+            continue
+        name = f'{prefix}{key}'
+        if isinstance(value, dict) and isinstance(previous[key], dict):
+            lines.extend(compare(previous[key], value, f'{name}.'))
+        elif isinstance(value, (int, float)) and isinstance(previous[key], (int, float)) and previous[key]:
+            change = (value - previous[key]) / previous[key] * 100
+            lines.append(f"{name}: {previous[key]} -> {value} ({change:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ingest and chat hot paths')
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100], help='synthetic PDF sizes in pages')
+    parser.add_argument('--queries', type=int, default=200, help='distinct retrieval queries')
+    parser.add_argument('--chat-queries', type=int, default=50, help='end-to-end /api/chat requests')
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='fake LLM seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='fake LLM seconds between tokens')
+    parser.add_argument('--llm-tokens', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--no-embedding-cache', action='store_true', help='measure cold embedding on every run')
+    parser.add_argument('--workdir', help='scratch directory (default: a new temp dir, removed afterwards)')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--compare', help='previous JSON results to diff against')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='medbot-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    configure_environment(args, workdir)
+
+    try:
+        start = time.perf_counter()
+        from app import create_app, components, document_processor, rag_system
+        flask_app = create_app()
+        startup_seconds = time.perf_counter() - start
+        for component in components.values():
+            component.get()
+        ready_seconds = time.perf_counter() - start
+
+        pdf_paths = {}
+        for num_pages in args.pages:
+            path = os.path.join(workdir, f'synthetic_{num_pages}p.pdf')
+            write_synthetic_pdf(path, num_pages, seed=args.seed + num_pages)
+            pdf_paths[num_pages] = path
+
+        rng = random.Random(args.seed)
+        queries = generate_queries(rng, args.queries + args.chat_queries)
+
+        print("Ingest:")
+        ingest = bench_ingest(document_processor, rag_system, pdf_paths)
+        print("Retrieval:")
+        retrieval = bench_retrieval(rag_system, queries[:args.queries], args.k)
+        print(f"  {retrieval}")
+        print("Chat:")
+        chat = bench_chat(flask_app, queries[args.queries:])
+        print(f"  {chat}")
+
+        results = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'config': {
+                'pages': args.pages,
+                'queries': args.queries,
+                'chat_queries': args.chat_queries,
+                'k': args.k,
+                'llm_latency': args.llm_latency,
+                'token_delay': args.token_delay,
+                'llm_tokens': args.llm_tokens,
+                'seed': args.seed,
+                'embedding_model': os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2'),
+                'ann_backend': os.getenv('ANN_BACKEND', 'chroma'),
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count()
+            },
+            'startup_seconds': round(startup_seconds, 3),
+            'ready_seconds': round(ready_seconds, 3),
+            'ingest': ingest,
+            'retrieval': retrieval,
+            'chat': chat,
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(results, file, indent=2)
+            print(f"Results written to {args.output}")
+
+        if args.compare:
+            with open(args.compare) as file:
+                previous = json.load(file)
+            print(f"Compared with {args.compare}:")
+            for line in compare(previous, results):
+                print(f"  {line}")
+
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
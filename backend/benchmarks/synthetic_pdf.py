@@ -0,0 +1,110 @@
+import random
+from typing import List
+
+DRUGS = [
+    'metformin', 'lisinopril', 'atorvastatin', 'amlodipine', 'warfarin', 'apixaban',
+    'levothyroxine', 'omeprazole', 'sertraline', 'amoxicillin', 'insulin glargine',
+    'prednisone', 'furosemide', 'clopidogrel', 'gabapentin', 'hydrochlorothiazide'
+]
+CONDITIONS = [
+    'type 2 diabetes', 'hypertension', 'atrial fibrillation', 'heart failure',
+    'hypothyroidism', 'community-acquired pneumonia', 'chronic kidney disease',
+    'major depressive disorder', 'asthma', 'COPD', 'hyperlipidemia', 'migraine'
+]
+LABS = ['HbA1c', 'eGFR', 'INR', 'LDL-C', 'TSH', 'serum potassium', 'ALT', 'troponin I']
+UNITS = ['mg', 'mcg', 'units', 'mL']
+TEMPLATES = [
+    "For patients with {condition}, {drug} is started at {dose} {unit} once daily and titrated every {weeks} weeks.",
+    "Monitor {lab} at baseline and after {weeks} weeks of {drug} therapy; adjust the dose if values fall outside the target range.",
+    "Common side effects of {drug} include nausea, dizziness and headache; discontinue if severe hypersensitivity occurs.",
+    "In {condition}, the recommended maximum dose of {drug} is {dose} {unit} per day in divided doses.",
+    "Drug interaction: co-administration of {drug} with {drug2} may increase bleeding risk and requires {lab} monitoring.",
+    "Guideline recommendation (grade {grade}): consider {drug} as first-line treatment for {condition} unless contraindicated.",
+]
+
+
+def generate_page_text(rng: random.Random, sentences: int = 40) -> str:
+    """Generate one page of guideline-style clinical prose"""
+    lines = []
+    for _ in range(sentences):
+        lines.append(rng.choice(TEMPLATES).format(
+            condition=rng.choice(CONDITIONS),
+            drug=rng.choice(DRUGS),
+            drug2=rng.choice(DRUGS),
+            lab=rng.choice(LABS),
+            dose=rng.choice([5, 10, 20, 25, 50, 100, 250, 500, 1000]),
+            unit=rng.choice(UNITS),
+            weeks=rng.randint(1, 12),
+            grade=rng.choice('ABC')
+        ))
+    return "\n".join(lines)
+
+
+def generate_queries(rng: random.Random, count: int) -> List[str]:
+    """Generate distinct clinical questions"""
+    patterns = [
+        "What is the dosage of {drug} for {condition}?",
+        "What are the side effects of {drug}?",
+        "How often should {lab} be monitored on {drug}?",
+        "Does {drug} interact with {drug2}?",
+        "What is first-line treatment for {condition}?",
+        "What is the maximum dose of {drug} in {unit}?",
+    ]
+    queries = set()
+    while len(queries) < count:
+        queries.add(rng.choice(patterns).format(
+            drug=rng.choice(DRUGS), drug2=rng.choice(DRUGS), condition=rng.choice(CONDITIONS),
+            lab=rng.choice(LABS), unit=rng.choice(UNITS)
+        ) + f" (case {len(queries)})")
+    return sorted(queries)
+
+
+def _escape(text: str) -> bytes:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)').encode('latin-1', 'replace')
+
+
+def write_pdf(path: str, pages: List[str]):
+    """Write a minimal multi-page text PDF readable by PyPDF2"""
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 1 + 2 * len(pages)
+    page_ids = []
+
+    for text in pages:
+        lines = b" ".join(b"(" + _escape(line) + b") '" for line in text.split("\n"))
+        stream = b"BT /F1 9 Tf 40 760 Td 11 TL " + lines + b" ET"
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+
+    add(b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids) + b"] /Count %d >>" % len(page_ids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref_offset
+    )
+
+    with open(path, 'wb') as file:
+        file.write(output)
+
+
+def write_synthetic_pdf(path: str, num_pages: int, seed: int = 0, sentences_per_page: int = 40):
+    """Write a synthetic medical guideline PDF with the given number of pages"""
+    rng = random.Random(seed)
+    write_pdf(path, [generate_page_text(rng, sentences_per_page) for _ in range(num_pages)])
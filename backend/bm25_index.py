@@ -0,0 +1,206 @@
+import os
+import re
+import math
+import heapq
+import pickle
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from index_files import file_lock, file_version
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+NUMBER_PATTERN = re.compile(r"[0-9]+(?:\.[0-9]+)?")
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i in is it its of on or
+should that the this to was what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens, plus joined number+unit tokens so "500 mg" also matches "500mg" """
+    words = TOKEN_PATTERN.findall(text.lower())
+    tokens = [word for word in words if word not in STOPWORDS]
+
+    for current, following in zip(words, words[1:]):
+        if NUMBER_PATTERN.fullmatch(current) and following.isalpha() and len(following) <= 5:
+            tokens.append(current + following)
+
+    return tokens
+
+
+class BM25Index:
+    """Incremental in-memory inverted index with Okapi BM25 scoring, persisted with pickle.
+
+    Changes since the last save are kept in a log. When another process has saved
+    the file in the meantime, its contents are loaded and the log is replayed on
+    top, so saving merges both processes' chunks instead of overwriting them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.k1 = float(os.getenv('BM25_K1', 1.5))
+        self.b = float(os.getenv('BM25_B', 0.75))
+        # Terms in more than this share of chunks carry little signal and are skipped,
+        # which keeps query cost proportional to the postings of rare terms
+        self.max_df_ratio = float(os.getenv('BM25_MAX_DF_RATIO', 0.5))
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # (chunk_id, term counts or None for a delete) since the last save
+        self._changes: List[Tuple[str, Optional[Dict[str, int]]]] = []
+        self._cleared = False
+        self._version = None
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, items: Iterable[Tuple[str, str]]):
+        """Index (chunk_id, text) pairs, replacing chunks that are already indexed"""
+        with self._lock:
+            for chunk_id, text in items:
+                term_counts = dict(Counter(tokenize(text)))
+                self._remove(chunk_id)
+                self._insert(chunk_id, term_counts)
+                self._changes.append((chunk_id, term_counts))
+
+    def delete(self, chunk_ids: Iterable[str]):
+        """Remove chunks from the index"""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._remove(chunk_id)
+                self._changes.append((chunk_id, None))
+
+    def clear(self):
+        """Remove every chunk from the index"""
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_lengths = {}
+            self._total_length = 0
+            self._changes = []
+            self._cleared = True
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Return the top-k (chunk_id, score) pairs for a query"""
+        with self._lock:
+            num_docs = len(self._doc_terms)
+            if num_docs == 0:
+                return []
+
+            average_length = self._total_length / num_docs
+            # Only prune common terms once the corpus is large enough for df to be meaningful
+            max_df = int(num_docs * self.max_df_ratio) if num_docs >= 1000 else num_docs
+            scores: Dict[str, float] = {}
+
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings or len(postings) > max_df:
+                    continue
+
+                df = len(postings)
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self):
+        """Atomically write the index next to the vector store, if it changed since the last save"""
+        with self._sync_lock, file_lock(self.path):
+            self._merge_saved()
+
+            # Searches only wait for the copy, not for the pickling and the write;
+            # per-chunk term counts are replaced, never mutated, so they are not copied
+            with self._lock:
+                if not self._changes and not self._cleared:
+                    return
+                state = {
+                    'postings': {term: dict(chunk_counts) for term, chunk_counts in self._postings.items()},
+                    'doc_terms': dict(self._doc_terms)
+                }
+                changes, cleared = self._changes, self._cleared
+                self._changes, self._cleared = [], False
+
+            try:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'wb') as file:
+                    pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                with self._lock:
+                    self._changes = changes + self._changes
+                    self._cleared = self._cleared or cleared
+                raise
+            self._version = file_version(self.path)
+
+    def _merge_saved(self) -> bool:
+        """Replace the index with the saved file plus this process's unsaved changes, if the file changed"""
+        version = file_version(self.path)
+        if version == self._version:
+            return False
+        if version is None or self._cleared:
+            # Nothing to merge, or a clear that replaces whatever was saved before it
+            self._version = version
+            return False
+
+        state = self._read()
+        with self._lock:
+            self._postings, self._doc_terms, self._doc_lengths, self._total_length = state
+            for chunk_id, term_counts in self._changes:
+                self._remove(chunk_id)
+                if term_counts is not None:
+                    self._insert(chunk_id, term_counts)
+        self._version = version
+        return True
+
+    def _insert(self, chunk_id: str, term_counts: Dict[str, int]):
+        """Add one chunk's postings (lock must be held)"""
+        length = sum(term_counts.values())
+        self._doc_terms[chunk_id] = term_counts
+        self._doc_lengths[chunk_id] = length
+        self._total_length += length
+        for term, count in term_counts.items():
+            self._postings.setdefault(term, {})[chunk_id] = count
+
+    def _remove(self, chunk_id: str):
+        """Drop one chunk's postings (lock must be held)"""
+        term_counts = self._doc_terms.pop(chunk_id, None)
+        if term_counts is None:
+            return
+
+        self._total_length -= self._doc_lengths.pop(chunk_id)
+        for term in term_counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _read(self) -> Tuple[Dict, Dict, Dict, int]:
+        """Postings, term counts, chunk lengths and total length from the saved file"""
+        with open(self.path, 'rb') as file:
+            state = pickle.load(file)
+        doc_lengths = {
+            chunk_id: sum(term_counts.values()) for chunk_id, term_counts in state['doc_terms'].items()
+        }
+        return state['postings'], state['doc_terms'], doc_lengths, sum(doc_lengths.values())
+
+    def _load(self):
+        """Load a previously saved index if present"""
+        version = file_version(self.path)
+        if version is None:
+            return
+
+        try:
+            self._postings, self._doc_terms, self._doc_lengths, self._total_length = self._read()
+            self._version = version
+        except Exception as e:
+            print(f"Could not load BM25 index, starting empty: {str(e)}")
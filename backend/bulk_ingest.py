@@ -0,0 +1,294 @@
+"""Bulk ingestion of a directory tree or manifest of PDFs.
+
+Files are parsed and chunked in a process pool while the main process embeds
+the previous batch and a writer thread stores the one before that. Each batch
+of whole files is written with a single upsert and a single persist(), then
+recorded in a checkpoint so an interrupted run resumes where it stopped.
+
+    cd backend
+    python bulk_ingest.py /data/guidelines
+    python bulk_ingest.py --manifest files.jsonl --workers 8 --batch-chunks 4096
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+_worker_processor = None
+
+
+def _parse_file(filepath: str) -> List:
+    """Parse and chunk one PDF in a pool worker"""
+    global _worker_processor
+    if _worker_processor is None:
+        from document_processor import DocumentProcessor
+        _worker_processor = DocumentProcessor()
+    return _worker_processor.process_pdf(filepath)
+
+
+def discover_files(directory: str) -> Iterator[Tuple[str, str]]:
+    """Yield (path, filename) for every PDF under a directory, in a stable order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith('.pdf'):
+                path = os.path.join(root, name)
+                yield os.path.abspath(path), os.path.relpath(path, directory)
+
+
+def read_manifest(path: str) -> Iterator[Tuple[str, str]]:
+    """Yield (path, filename) from a manifest: JSON lines with "path" (and optional
+    "filename"), or plain lines with one path each"""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                filepath, filename = entry['path'], entry.get('filename')
+            else:
+                filepath, filename = line, None
+            filepath = os.path.abspath(os.path.join(base, filepath))
+            yield filepath, filename or os.path.basename(filepath)
+
+
+class IngestCheckpoint:
+    """Append-only JSON lines record of finished files, keyed by path, size and mtime"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._done: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a torn last line from an interrupted write
+                    self._done[entry['key']] = entry['status']
+        self._file = open(path, 'a')
+
+    @staticmethod
+    def key_for(filepath: str) -> str:
+        stat = os.stat(filepath)
+        return f"{filepath}:{stat.st_size}:{int(stat.st_mtime)}"
+
+    def status(self, key: str) -> Optional[str]:
+        return self._done.get(key)
+
+    def record(self, entries: List[Dict]):
+        """Durably record a batch of finished files"""
+        for entry in entries:
+            self._done[entry['key']] = entry['status']
+            self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class BulkIngestor:
+    """Pipelines parse -> embed -> write over many files with checkpointed batches"""
+
+    def __init__(self, rag_system, checkpoint: IngestCheckpoint, workers: int, batch_chunks: int):
+        self.rag_system = rag_system
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.batch_chunks = batch_chunks
+
+        self.stats = {'files': 0, 'skipped': 0, 'failed': 0, 'chunks': 0, 'batches': 0}
+        self._write_queue: "queue.Queue" = queue.Queue(maxsize=2)
+        self._write_error: Optional[Exception] = None
+        self._start = None
+
+    def run(self, files: Iterator[Tuple[str, str]], retry_failed: bool = False) -> Dict:
+        self._start = time.perf_counter()
+        writer = threading.Thread(target=self._write_loop, name='bulk-writer', daemon=True)
+        writer.start()
+
+        context = multiprocessing.get_context(os.getenv('PDF_MP_START_METHOD', 'spawn'))
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        in_flight = {}
+        batch_files: List[Dict] = []
+        batch_chunks: List = []
+        pending_files = self._pending_files(files, retry_failed)
+
+        try:
+            exhausted = False
+            while not exhausted or in_flight:
+                # Keep a bounded window of files in the pool
+                while not exhausted and len(in_flight) < self.workers * 4:
+                    item = next(pending_files, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    filepath, filename, key = item
+                    in_flight[pool.submit(_parse_file, filepath)] = (filepath, filename, key)
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filepath, filename, key = in_flight.pop(future)
+                    entry = {'key': key, 'path': filepath, 'filename': filename}
+                    try:
+                        chunks = future.result()
+                    except BrokenProcessPool:
+                        raise  # not the file's fault; leave it for the next run
+                    except Exception as e:
+                        print(f"Failed to parse {filepath}: {str(e)}")
+                        self.stats['failed'] += 1
+                        self.checkpoint.record([dict(entry, status='failed', error=str(e))])
+                        continue
+
+                    for chunk in chunks:
+                        chunk.metadata.update({'filename': filename, 'filepath': filepath})
+                    batch_files.append(dict(entry, status='done', chunks=len(chunks)))
+                    batch_chunks.extend(chunks)
+
+                    if len(batch_chunks) >= self.batch_chunks:
+                        self._embed_and_queue(batch_files, batch_chunks)
+                        batch_files, batch_chunks = [], []
+
+            if batch_files:
+                self._embed_and_queue(batch_files, batch_chunks)
+
+        finally:
+            # Drop files not yet parsed (shutdown's cancel_futures needs Python 3.9)
+            for future in in_flight:
+                future.cancel()
+            pool.shutdown(wait=False)
+            self._write_queue.put(None)
+            writer.join()
+            self.rag_system.save_indexes()
+
+        if self._write_error is not None:
+            raise self._write_error
+        return self.report()
+
+    def report(self) -> Dict:
+        elapsed = time.perf_counter() - self._start
+        return dict(
+            self.stats,
+            seconds=round(elapsed, 2),
+            docs_per_second=round(self.stats['files'] / elapsed, 2) if elapsed else None,
+            chunks_per_second=round(self.stats['chunks'] / elapsed, 1) if elapsed else None
+        )
+
+    def _pending_files(self, files: Iterator[Tuple[str, str]], retry_failed: bool) -> Iterator[Tuple[str, str, str]]:
+        """Files not already ingested by an earlier run"""
+        for filepath, filename in files:
+            try:
+                key = IngestCheckpoint.key_for(filepath)
+            except OSError as e:
+                print(f"Skipping {filepath}: {str(e)}")
+                self.stats['failed'] += 1
+                continue
+
+            status = self.checkpoint.status(key)
+            if status == 'done' or (status == 'failed' and not retry_failed):
+                self.stats['skipped'] += 1
+                continue
+            yield filepath, filename, key
+
+    def _embed_and_queue(self, files: List[Dict], chunks: List):
+        """Embed a batch here while the writer stores the previous one"""
+        if self._write_error is not None:
+            raise self._write_error
+        embeddings = self.rag_system.embed_documents(chunks) if chunks else []
+        self._write_queue.put((files, chunks, embeddings))
+
+    def _remove_stale_chunks(self, files: List[Dict], chunks: List):
+        """Drop chunks left over from earlier versions of the files just written"""
+        current: Dict[str, List[str]] = {}
+        for chunk, chunk_id in zip(chunks, self.rag_system.chunk_ids(chunks)):
+            current.setdefault(chunk.metadata['filename'], []).append(chunk_id)
+        for entry in files:
+            self.rag_system.remove_stale_chunks(entry['filename'], current.get(entry['filename'], []))
+
+    def _write_loop(self):
+        """Store batches in order; a batch is checkpointed only after it is persisted"""
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
+            if self._write_error is not None:
+                continue
+
+            files, chunks, embeddings = item
+            try:
+                if chunks:
+                    self.rag_system.add_documents(chunks, embeddings=embeddings)
+                self._remove_stale_chunks(files, chunks)
+                self.checkpoint.record(files)
+            except Exception as e:
+                print(f"Batch write failed, stopping: {str(e)}")
+                self._write_error = e
+                continue
+
+            self.stats['files'] += len(files)
+            self.stats['chunks'] += len(chunks)
+            self.stats['batches'] += 1
+            report = self.report()
+            print(
+                f"Batch {self.stats['batches']}: {self.stats['files']} files, {self.stats['chunks']} chunks "
+                f"({report['docs_per_second']} docs/s, {report['chunks_per_second']} chunks/s)"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-ingest a directory or manifest of PDFs')
+    parser.add_argument('directory', nargs='?', help='directory searched recursively for PDFs')
+    parser.add_argument('--manifest', help='file listing PDFs (JSON lines with "path"/"filename", or one path per line)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('PDF_WORKERS', max(1, (os.cpu_count() or 2) - 1))),
+                        help='parse/chunk worker processes')
+    parser.add_argument('--batch-chunks', type=int, default=int(os.getenv('BULK_INGEST_BATCH_CHUNKS', 2048)),
+                        help='chunks per embed/write batch (batches hold whole files)')
+    parser.add_argument('--checkpoint', help='checkpoint file (default: <VECTOR_DB_PATH>/bulk_ingest_checkpoint.jsonl)')
+    parser.add_argument('--retry-failed', action='store_true', help='retry files that failed in an earlier run')
+    args = parser.parse_args()
+
+    if bool(args.directory) == bool(args.manifest):
+        parser.error('give either a directory or --manifest')
+
+    load_dotenv()
+    vector_db_path = os.getenv('VECTOR_DB_PATH', './vector_db')
+    os.makedirs(vector_db_path, exist_ok=True)
+
+    from rag_system import RAGSystem
+    try:
+        rag_system = RAGSystem()
+    except Exception as e:
+        print(str(e))  # e.g. the server still has VECTOR_DB_PATH open
+        return 1
+
+    checkpoint = IngestCheckpoint(args.checkpoint or os.path.join(vector_db_path, 'bulk_ingest_checkpoint.jsonl'))
+    files = read_manifest(args.manifest) if args.manifest else discover_files(args.directory)
+    ingestor = BulkIngestor(rag_system, checkpoint, max(1, args.workers), max(1, args.batch_chunks))
+
+    try:
+        report = ingestor.run(files, retry_failed=args.retry_failed)
+    except KeyboardInterrupt:
+        report = ingestor.report()
+        print("Interrupted; rerun the same command to resume from the checkpoint")
+    finally:
+        checkpoint.close()
+
+    print(json.dumps(report, indent=2))
+    return 0 if report['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
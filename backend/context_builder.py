@@ -0,0 +1,176 @@
+import os
+import re
+from typing import Dict, List, Tuple
+from langchain.schema import Document
+
+SHINGLE_SIZE = 5
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """Counts tokens with the tiktoken encoding of the configured model.
+
+    Falls back to a four-characters-per-token estimate when tiktoken or its
+    encoding files are unavailable (e.g. offline, or a non-OpenAI model).
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            print(f"tiktoken unavailable for {model_name}, estimating tokens from length: {str(e)}")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens, preferring to end on a sentence boundary"""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            cut = self.encoding.decode(tokens[:max_tokens])
+        else:
+            if len(text) <= max_tokens * 4:
+                return text
+            cut = text[:max_tokens * 4]
+
+        sentence_end = cut.rfind('. ')
+        if sentence_end >= len(cut) // 2:
+            cut = cut[:sentence_end + 1]
+        return cut
+
+
+def _shingles(text: str) -> set:
+    words = WORD_PATTERN.findall(text.lower())
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+
+
+def _trim_overlap(text: str, selected: List[str], probe_length: int = 40) -> str:
+    """Remove text that repeats the start or end of an already selected chunk.
+
+    Neighbouring chunks from the splitter share up to CHUNK_OVERLAP characters,
+    so the head of one chunk is often the tail of the previous one and vice versa.
+    """
+    for other in selected:
+        # Our head repeats the other chunk's tail
+        position = other.find(text[:probe_length]) if len(text) >= probe_length else -1
+        if position > 0 and text.startswith(other[position:]):
+            text = text[len(other) - position:].lstrip()
+
+        # Our tail repeats the other chunk's head
+        if len(text) >= probe_length and len(other) >= probe_length:
+            position = text.find(other[:probe_length])
+            if position > 0 and other.startswith(text[position:]):
+                text = text[:position].rstrip()
+    return text
+
+
+class ContextBuilder:
+    """Packs retrieved chunks and chat history into a prompt token budget"""
+
+    def __init__(self, counter: TokenCounter):
+        self.counter = counter
+        # Tokens for the whole prompt (system prompt, template, question, context, history);
+        # the completion's max_tokens comes on top of this
+        self.prompt_budget = int(os.getenv('PROMPT_TOKEN_BUDGET', 3000))
+        # Share of the space left after the fixed prompt parts that history may use
+        self.history_share = float(os.getenv('HISTORY_TOKEN_SHARE', 0.25))
+        # Chunks whose word 5-grams are mostly already in the context are dropped
+        self.overlap_threshold = float(os.getenv('CONTEXT_OVERLAP_THRESHOLD', 0.8))
+        # A truncated chunk shorter than this is not worth including
+        self.min_chunk_tokens = int(os.getenv('MIN_CONTEXT_CHUNK_TOKENS', 64))
+
+    def build(self, fixed_tokens: int, documents: List[Document], chat_history: List[Dict]) -> Tuple[str, str, Dict]:
+        """Return (context, history, usage) fitting in the budget next to fixed_tokens of other prompt text"""
+        available = max(0, self.prompt_budget - fixed_tokens)
+
+        history, history_tokens, turns = self._pack_history(chat_history, int(available * self.history_share))
+        context, context_tokens, chunks = self._pack_documents(documents, available - history_tokens)
+
+        usage = {
+            'prompt_tokens': fixed_tokens + context_tokens + history_tokens,
+            'prompt_budget': self.prompt_budget,
+            'context_tokens': context_tokens,
+            'history_tokens': history_tokens,
+            'chunks_used': chunks,
+            'chunks_retrieved': len(documents),
+            'history_turns_used': turns
+        }
+        return context, history, usage
+
+    def _pack_history(self, chat_history: List[Dict], budget: int) -> Tuple[str, int, int]:
+        """Most recent exchanges that fit in the budget, oldest first"""
+        if not chat_history:
+            text = "No previous conversation."
+            return text, self.counter.count(text), 0
+
+        parts = []
+        used = 0
+        for exchange in reversed(chat_history):
+            turn = f"User: {exchange.get('user', '')}\nAssistant: {exchange.get('assistant', '')}"
+            tokens = self.counter.count(turn) + 1
+            if used + tokens > budget:
+                break
+            parts.append(turn)
+            used += tokens
+
+        if not parts:
+            text = "No previous conversation."
+            return text, self.counter.count(text), 0
+        return "\n".join(reversed(parts)), used, len(parts)
+
+    def _pack_documents(self, documents: List[Document], budget: int) -> Tuple[str, int, int]:
+        """Chunks in relevance order, skipping repeats, until the budget is spent"""
+        if not documents:
+            text = "No relevant medical documents found for this query."
+            return text, self.counter.count(text), 0
+
+        parts = []
+        selected_texts = []
+        seen_shingles = set()
+        used = 0
+
+        for doc in documents:
+            content = _trim_overlap(doc.page_content.strip(), selected_texts)
+            if not content:
+                continue
+
+            shingles = _shingles(content)
+            if len(shingles & seen_shingles) >= self.overlap_threshold * len(shingles):
+                continue
+
+            filename = doc.metadata.get('filename', 'Unknown document')
+            chunk_id = doc.metadata.get('chunk_id', '')
+            header = f"\nDocument {len(parts) + 1}: {filename} (Section {chunk_id})\nContent: "
+            header_tokens = self.counter.count(header)
+
+            remaining = budget - used - header_tokens
+            content_tokens = self.counter.count(content)
+            if content_tokens > remaining:
+                if remaining < self.min_chunk_tokens:
+                    break
+                content = self.counter.truncate(content, remaining)
+                content_tokens = self.counter.count(content)
+
+            parts.append(header + content + "\n")
+            selected_texts.append(content)
+            seen_shingles |= shingles
+            used += header_tokens + content_tokens
+
+        if not parts:
+            text = "No relevant medical documents found for this query."
+            return text, self.counter.count(text), 0
+        return "\n".join(parts), used, len(parts)
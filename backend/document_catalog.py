@@ -0,0 +1,139 @@
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+
+class DocumentCatalog:
+    """Persistent filename -> chunk IDs catalog kept in step with the vector store.
+
+    Listing and deleting documents read this instead of scanning every chunk's
+    metadata in the collection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                filename TEXT PRIMARY KEY,
+                document_type TEXT NOT NULL,
+                chunks INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                chunk_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL
+            )
+        """)
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_document_chunks_filename ON document_chunks(filename)'
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def add_chunks(self, chunks: Iterable[Tuple[str, str, str]]):
+        """Record (chunk_id, filename, document_type) triples; known chunk IDs are ignored"""
+        by_file: Dict[str, Tuple[str, List[str]]] = {}
+        for chunk_id, filename, document_type in chunks:
+            by_file.setdefault(filename, (document_type, []))[1].append(chunk_id)
+        if not by_file:
+            return
+
+        now = time.time()
+        with self._lock:
+            for filename, (document_type, chunk_ids) in by_file.items():
+                cursor = self._conn.executemany(
+                    'INSERT OR IGNORE INTO document_chunks (chunk_id, filename) VALUES (?, ?)',
+                    [(chunk_id, filename) for chunk_id in chunk_ids]
+                )
+                added = max(cursor.rowcount, 0)
+                self._conn.execute(
+                    """INSERT INTO documents (filename, document_type, chunks, updated_at) VALUES (?, ?, ?, ?)
+                       ON CONFLICT(filename) DO UPDATE SET
+                           chunks = chunks + excluded.chunks,
+                           document_type = excluded.document_type,
+                           updated_at = excluded.updated_at""",
+                    (filename, document_type, added, now)
+                )
+            self._conn.commit()
+
+    def chunk_ids(self, filename: str) -> List[str]:
+        """IDs of every chunk belonging to a document"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT chunk_id FROM document_chunks WHERE filename = ?', (filename,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def get(self, filename: str) -> Dict:
+        """One document's catalog entry, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT filename, chunks, document_type FROM documents WHERE filename = ?', (filename,)
+            ).fetchone()
+        return self._row_to_document(row) if row else None
+
+    def list(self, offset: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        """A page of documents ordered by filename, and the total number of documents"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT filename, chunks, document_type FROM documents ORDER BY filename LIMIT ? OFFSET ?',
+                (limit, offset)
+            ).fetchall()
+            total = self._conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        return [self._row_to_document(row) for row in rows], total
+
+    def remove_document(self, filename: str):
+        """Forget a document and its chunks"""
+        with self._lock:
+            self._conn.execute('DELETE FROM document_chunks WHERE filename = ?', (filename,))
+            self._conn.execute('DELETE FROM documents WHERE filename = ?', (filename,))
+            self._conn.commit()
+
+    def remove_chunks(self, chunk_ids: List[str]):
+        """Forget individual chunks, dropping documents left without any"""
+        with self._lock:
+            filenames = set()
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                filenames.update(row[0] for row in self._conn.execute(
+                    f'SELECT DISTINCT filename FROM document_chunks WHERE chunk_id IN ({placeholders})', batch
+                ))
+                self._conn.execute(f'DELETE FROM document_chunks WHERE chunk_id IN ({placeholders})', batch)
+
+            now = time.time()
+            for filename in filenames:
+                self._conn.execute(
+                    """UPDATE documents SET updated_at = ?,
+                           chunks = (SELECT COUNT(*) FROM document_chunks WHERE filename = ?)
+                       WHERE filename = ?""",
+                    (now, filename, filename)
+                )
+            self._conn.execute('DELETE FROM documents WHERE chunks = 0')
+            self._conn.commit()
+
+    def clear(self):
+        """Forget every document"""
+        with self._lock:
+            self._conn.execute('DELETE FROM document_chunks')
+            self._conn.execute('DELETE FROM documents')
+            self._conn.commit()
+
+    def _row_to_document(self, row) -> Dict:
+        filename, chunks, document_type = row
+        return {
+            'filename': filename,
+            'chunks': chunks,
+            'document_type': document_type
+        }
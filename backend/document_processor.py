@@ -1,86 +1,214 @@
 import os
-import PyPDF2
-from typing import List, Dict
+import re
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterator, Tuple
+from pdf_extractor import count_pages, extract_page_range
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
+from keyword_matcher import KeywordMatcher
+
+# Compiled once; a single scan of the text finds every category's keywords
+MEDICAL_ENTITY_MATCHER = KeywordMatcher({
+    'medications': ['mg', 'ml', 'tablet', 'capsule', 'dose', 'medication', 'drug'],
+    'conditions': ['diagnosis', 'syndrome', 'disease', 'disorder', 'infection'],
+    'procedures': ['surgery', 'procedure', 'treatment', 'therapy', 'intervention'],
+    'lab_values': ['level', 'count', 'result', 'test', 'lab', 'blood', 'urine']
+})
+
+# Characters _clean_text replaces with a space
+SPECIAL_CHARACTERS = re.compile(r'[^\w\s\.\,\;\:\!\?\-\(\)\[\]]')
+
+
+def _space_after(text: str, mark: str) -> str:
+    """Leave exactly one space after each mark and none before it; text's only whitespace must be ' '"""
+    pieces = text.split(mark)
+    if len(pieces) == 1:
+        return text
+    inner = [piece.strip(' ') for piece in pieces[1:-1]]
+    return (mark + ' ').join([pieces[0].rstrip(' ')] + inner + [pieces[-1].lstrip(' ')])
+
 
 class DocumentProcessor:
     """Handles processing of medical documents"""
     
     def __init__(self):
+        self.chunk_size = int(os.getenv('CHUNK_SIZE', 1000))
+        self.chunk_overlap = int(os.getenv('CHUNK_OVERLAP', 200))
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=int(os.getenv('CHUNK_SIZE', 1000)),
-            chunk_overlap=int(os.getenv('CHUNK_OVERLAP', 200)),
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
+        
+        # Process pool for page extraction, created on first streaming use
+        self.pdf_workers = int(os.getenv('PDF_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+        self.pages_per_task = int(os.getenv('PDF_PAGES_PER_TASK', 8))
+        self._pool = None
+        self._pool_lock = threading.Lock()
     
     def process_pdf(self, filepath: str) -> List[Document]:
         """Extract text from PDF and split into chunks"""
+        text = self.extract_text(filepath)
+        return self.split_into_chunks(text, filepath)
+    
+    def extract_text(self, filepath: str) -> str:
+        """Extract the raw text of every page of a PDF"""
         try:
-            with open(filepath, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    text += f"\n\n--- Page {page_num + 1} ---\n\n{page_text}"
+            parts = [
+                f"\n\n--- Page {page_num} ---\n\n{page_text}"
+                for page_num, page_text in extract_page_range(filepath)
+            ]
+            return "".join(parts)
                 
-                # Clean the text
-                text = self._clean_text(text)
-                
-                # Split into chunks
-                chunks = self.text_splitter.split_text(text)
-                
-                # Create Document objects
-                documents = []
-                for i, chunk in enumerate(chunks):
-                    doc = Document(
-                        page_content=chunk,
-                        metadata={
-                            'source': filepath,
-                            'chunk_id': i,
-                            'total_chunks': len(chunks),
-                            'document_type': 'medical_pdf'
-                        }
-                    )
-                    documents.append(doc)
-                
-                return documents
+        except Exception as e:
+            raise Exception(f"Error processing PDF {filepath}: {str(e)}")
+    
+    def stream_pdf(self, filepath: str) -> Iterator[Document]:
+        """Yield chunks page by page as soon as each page has been extracted"""
+        chunk_id = 0
+        for page_num, page_text in self.iter_pages(filepath):
+            page_chunks = self.split_page(page_text, page_num, filepath, first_chunk_id=chunk_id)
+            chunk_id += len(page_chunks)
+            yield from page_chunks
+    
+    def iter_pages(self, filepath: str) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) in page order, extracting ranges across a process pool"""
+        try:
+            total_pages = count_pages(filepath)
+            
+            # Small documents are not worth the inter-process round trip
+            if total_pages <= self.pages_per_task or self.pdf_workers <= 1:
+                yield from extract_page_range(filepath, 0, total_pages)
+                return
+            
+            pool = self._get_pool()
+            ranges = deque(
+                (start, start + self.pages_per_task)
+                for start in range(0, total_pages, self.pages_per_task)
+            )
+            
+            # Keep a bounded window of ranges in flight so memory tracks pool size
+            in_flight = deque()
+            while ranges or in_flight:
+                while ranges and len(in_flight) < self.pdf_workers * 2:
+                    start, end = ranges.popleft()
+                    in_flight.append(pool.submit(extract_page_range, filepath, start, end))
+                yield from in_flight.popleft().result()
                 
         except Exception as e:
             raise Exception(f"Error processing PDF {filepath}: {str(e)}")
     
+    def split_page(self, page_text: str, page_num: int, filepath: str, first_chunk_id: int = 0) -> List[Document]:
+        """Clean and split a single page into Document chunks tagged with its page number"""
+        text = self._clean_text(f"--- Page {page_num} ---\n\n{page_text}")
+        
+        return [
+            Document(
+                page_content=chunk,
+                metadata={
+                    'source': filepath,
+                    'chunk_id': first_chunk_id + i,
+                    'page': page_num,
+                    'document_type': 'medical_pdf'
+                }
+            )
+            for i, chunk in enumerate(self._split_text(text))
+        ]
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Lazily create the shared page-extraction process pool"""
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawn rather than fork: the server process is multi-threaded
+                context = multiprocessing.get_context(os.getenv('PDF_MP_START_METHOD', 'spawn'))
+                self._pool = ProcessPoolExecutor(max_workers=self.pdf_workers, mp_context=context)
+            return self._pool
+    
+    def split_into_chunks(self, text: str, filepath: str) -> List[Document]:
+        """Clean extracted text and split it into Document chunks"""
+        try:
+            # Clean the text
+            text = self._clean_text(text)
+            
+            # Split into chunks
+            chunks = self._split_text(text)
+            
+            # Create Document objects
+            documents = []
+            for i, chunk in enumerate(chunks):
+                doc = Document(
+                    page_content=chunk,
+                    metadata={
+                        'source': filepath,
+                        'chunk_id': i,
+                        'total_chunks': len(chunks),
+                        'document_type': 'medical_pdf'
+                    }
+                )
+                documents.append(doc)
+            
+            return documents
+            
+        except Exception as e:
+            raise Exception(f"Error processing PDF {filepath}: {str(e)}")
+    
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text"""
-        # Remove excessive whitespace
-        import re
-        text = re.sub(r'\s+', ' ', text)
+        # Remove excessive whitespace (str.split() uses the same whitespace class as \s)
+        text = " ".join(text.split())
         
         # Remove special characters that might interfere
-        text = re.sub(r'[^\w\s\.\,\;\:\!\?\-\(\)\[\]]', ' ', text)
+        text = SPECIAL_CHARACTERS.sub(' ', text)
         
-        # Normalize spacing around punctuation
-        text = re.sub(r'\s*\.\s*', '. ', text)
-        text = re.sub(r'\s*\,\s*', ', ', text)
+        # Normalize spacing around punctuation; only ' ' is left as whitespace,
+        # so plain splits and joins replace the \s*.\s* and \s*,\s* regexes
+        text = _space_after(text, '.')
+        text = _space_after(text, ',')
         
         return text.strip()
     
-    def extract_medical_entities(self, text: str) -> Dict:
-        """Extract medical entities from text (basic implementation)"""
-        # This is a simplified version - in production, you'd use medical NER models
-        medical_keywords = {
-            'medications': ['mg', 'ml', 'tablet', 'capsule', 'dose', 'medication', 'drug'],
-            'conditions': ['diagnosis', 'syndrome', 'disease', 'disorder', 'infection'],
-            'procedures': ['surgery', 'procedure', 'treatment', 'therapy', 'intervention'],
-            'lab_values': ['level', 'count', 'result', 'test', 'lab', 'blood', 'urine']
-        }
+    def _split_text(self, text: str) -> List[str]:
+        """Split cleaned text into chunks, exactly as self.text_splitter.split_text would.
         
-        entities = {}
-        text_lower = text.lower()
+        Cleaned text has no newlines, so the splitter goes straight to its ". "
+        separator. When every sentence fits in a chunk the sentences are merged here
+        in a single pass; anything else goes through the generic splitter.
+        """
+        sentences = text.split('. ')
+        if len(sentences) == 1 or '\n' in text:
+            return self.text_splitter.split_text(text)
         
-        for category, keywords in medical_keywords.items():
-            found_keywords = [kw for kw in keywords if kw in text_lower]
-            if found_keywords:
-                entities[category] = found_keywords
+        # The splitter keeps each separator at the start of the following piece
+        splits = [sentences[0]] if sentences[0] else []
+        splits.extend('. ' + sentence for sentence in sentences[1:])
+        lengths = [len(split) for split in splits]
+        if max(lengths) >= self.chunk_size:
+            return self.text_splitter.split_text(text)
         
-        return entities
+        # Same merge as TextSplitter._merge_splits with an empty separator
+        chunks = []
+        window = deque()
+        total = 0
+        for split, length in zip(splits, lengths):
+            if total + length > self.chunk_size and window:
+                chunk = "".join(piece for piece, _ in window).strip()
+                if chunk:
+                    chunks.append(chunk)
+                # Drop pieces from the front until only the overlap is left
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    total -= window.popleft()[1]
+            window.append((split, length))
+            total += length
+        
+        chunk = "".join(piece for piece, _ in window).strip()
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+    
+    def extract_medical_entities(self, text: str) -> Dict:
+        """Extract medical entities from text (basic implementation)"""
+        # This is a simplified version - in production, you'd use medical NER models
+        return MEDICAL_ENTITY_MATCHER.find(text.lower())
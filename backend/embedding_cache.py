@@ -0,0 +1,123 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Dict, List
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a chunk's text"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent chunk-hash -> embedding cache with LRU, size-bounded eviction"""
+
+    def __init__(self, path: str, model_name: str):
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 500000))
+        self.max_bytes = int(float(os.getenv('EMBEDDING_CACHE_MAX_MB', 1024)) * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)'
+        )
+        self._conn.commit()
+
+        self._entries = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, text: str) -> str:
+        """Cache key for a chunk, scoped to the embedding model"""
+        return content_hash(f"{self.model_name}\x00{text}")
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for the given keys and refresh their LRU position"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})', batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array('f')
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    'UPDATE embeddings SET last_access = ? WHERE key = ?',
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique_keys) - len(found)
+
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Store vectors and evict least recently used entries beyond the limits"""
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = array('f', vector).tobytes()
+            rows.append((key, blob, len(blob), now))
+
+        with self._lock:
+            # Keys are content-addressed, so an existing row already holds the same vector
+            cursor = self._conn.executemany(
+                'INSERT OR IGNORE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self._entries += max(cursor.rowcount, 0)
+            self._evict(len(rows[0][1]))
+            self._conn.commit()
+
+    def get_stats(self) -> Dict:
+        """Return hit/miss counters and current footprint"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': self._entries
+            }
+
+    def _evict(self, vector_bytes: int):
+        """Drop least recently used entries until both limits hold (lock must be held)"""
+        # All vectors from one model have the same size, so the byte cap is an entry cap
+        limit = min(self.max_entries, self.max_bytes // max(vector_bytes, 1))
+        if self._entries <= limit:
+            return
+
+        cursor = self._conn.execute(
+            """DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?
+            )""",
+            (self._entries - limit,)
+        )
+        self._entries -= cursor.rowcount
@@ -0,0 +1,108 @@
+import os
+import copy
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class EmbeddingEngine:
+    """Batched CPU embedding stage that groups chunks by token length to cut padding"""
+
+    def __init__(self, model):
+        # `model` is a sentence-transformers model (HuggingFaceEmbeddings.client)
+        self.model = model
+        self.model.eval()
+        # sentence-transformers' encode() (query embedding) switches the shared fast tokenizer
+        # to padding=True; calling it concurrently with other settings fails with
+        # "Already borrowed", so this engine tokenizes with its own copy
+        self.tokenizer = copy.deepcopy(model.tokenizer)
+        self._tokenizer_lock = threading.Lock()
+        self.batch_size = int(os.getenv('EMBEDDING_BATCH_SIZE', 64))
+        self.normalize = os.getenv('EMBEDDING_NORMALIZE', 'false').lower() == 'true'
+
+        threads = os.getenv('EMBEDDING_THREADS')
+        if threads:
+            import torch
+            torch.set_num_threads(int(threads))
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'chunks': 0,
+            'batches': 0,
+            'seconds': 0.0,
+            'tokens': 0,
+            'padded_tokens': 0,
+            'last_chunks_per_second': 0.0
+        }
+
+    def embed(self, texts: List[str], progress_callback: Optional[Callable[[int, int], None]] = None) -> List[List[float]]:
+        """Embed texts in length-sorted micro-batches, returning vectors in input order"""
+        if not texts:
+            return []
+
+        import torch
+
+        start = time.perf_counter()
+        tokenizer = self.tokenizer
+
+        # Tokenize once without padding so batches can be formed by real token length
+        with self._tokenizer_lock:
+            encoded = tokenizer(
+                texts,
+                truncation=True,
+                max_length=self.model.max_seq_length,
+                padding=False
+            )
+        lengths = [len(ids) for ids in encoded['input_ids']]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        padded_tokens = 0
+        batches = 0
+
+        with torch.inference_mode():
+            for batch_start in range(0, len(order), self.batch_size):
+                batch_idx = order[batch_start:batch_start + self.batch_size]
+                features = tokenizer.pad(
+                    {key: [encoded[key][i] for i in batch_idx] for key in encoded.keys()},
+                    return_tensors='pt'
+                )
+                features = {key: value.to(self.model.device) for key, value in features.items()}
+
+                embeddings = self.model(features)['sentence_embedding']
+                if self.normalize:
+                    embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+
+                for i, vector in zip(batch_idx, embeddings.cpu().tolist()):
+                    vectors[i] = vector
+
+                padded_tokens += len(batch_idx) * lengths[batch_idx[-1]]
+                batches += 1
+                if progress_callback:
+                    progress_callback(min(batch_start + self.batch_size, len(order)), len(order))
+
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self._stats['chunks'] += len(texts)
+            self._stats['batches'] += batches
+            self._stats['seconds'] += elapsed
+            self._stats['tokens'] += sum(lengths)
+            self._stats['padded_tokens'] += padded_tokens
+            self._stats['last_chunks_per_second'] = len(texts) / elapsed if elapsed > 0 else 0.0
+
+        print(f"Embedded {len(texts)} chunks in {elapsed:.2f}s "
+              f"({len(texts) / elapsed if elapsed > 0 else 0.0:.1f} chunks/s)")
+
+        return vectors
+
+    def get_stats(self) -> Dict:
+        """Return cumulative throughput and padding statistics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+
+        stats['chunks_per_second'] = stats['chunks'] / stats['seconds'] if stats['seconds'] else 0.0
+        stats['padding_ratio'] = (
+            stats['padded_tokens'] / stats['tokens'] if stats['tokens'] else 0.0
+        )
+        stats['batch_size'] = self.batch_size
+        return stats
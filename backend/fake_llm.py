@@ -0,0 +1,54 @@
+import os
+import time
+import asyncio
+from typing import AsyncIterator, Iterator, List
+from langchain.schema import AIMessage, BaseMessage
+from langchain.schema.messages import AIMessageChunk
+
+
+class FakeChatModel:
+    """Local stand-in for ChatOpenAI that emits canned tokens on a timer.
+
+    Selected with LLM_PROVIDER=fake; used for streaming tests and benchmarks
+    without network access or API keys.
+    """
+
+    def __init__(self):
+        self.first_token_delay = float(os.getenv('FAKE_LLM_FIRST_TOKEN_DELAY', 0.2))
+        self.token_delay = float(os.getenv('FAKE_LLM_TOKEN_DELAY', 0.02))
+        self.num_tokens = int(os.getenv('FAKE_LLM_TOKENS', 60))
+
+    def __call__(self, messages: List[BaseMessage]) -> AIMessage:
+        """Return the full completion after the simulated generation time"""
+        return AIMessage(content="".join(chunk.content for chunk in self.stream(messages)))
+
+    def stream(self, messages: List[BaseMessage]) -> Iterator[AIMessageChunk]:
+        """Yield the completion token by token"""
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens(messages)):
+            if i:
+                time.sleep(self.token_delay)
+            yield AIMessageChunk(content=token)
+
+    async def ainvoke(self, messages: List[BaseMessage]) -> AIMessage:
+        """Async variant of __call__ that waits without blocking the event loop"""
+        parts = [chunk.content async for chunk in self.astream(messages)]
+        return AIMessage(content="".join(parts))
+
+    async def astream(self, messages: List[BaseMessage]) -> AsyncIterator[AIMessageChunk]:
+        """Async variant of stream"""
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens(messages)):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield AIMessageChunk(content=token)
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        """Build a deterministic answer from the last message in the prompt"""
+        prompt = messages[-1].content if messages else ""
+        words = prompt.split() or ["No", "prompt", "provided."]
+
+        tokens = ["Based", " on", " the", " provided", " medical", " context:"]
+        while len(tokens) < self.num_tokens:
+            tokens.append(" " + words[len(tokens) % len(words)])
+        return tokens[:self.num_tokens]
@@ -0,0 +1,57 @@
+import os
+import contextlib
+from typing import Dict, IO, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves from different processes are not serialized
+    fcntl = None
+
+# Only one process may use VECTOR_DB_PATH at a time (claim_directory). The side index
+# files are still saved under an exclusive lock that first merges in whatever another
+# process saved since this one last read the file, so a stale copy is never written over
+# a newer one.
+
+# Directory locks held by this process, kept open until it exits
+_claimed: Dict[str, IO] = {}
+
+
+def file_version(path: str) -> Optional[Tuple[int, int, int]]:
+    """Identity of a saved file's current contents, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def claim_directory(directory: str) -> bool:
+    """Lock `directory` for the rest of this process's life; False if another process holds it"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.realpath(os.path.join(directory, '.owner.lock'))
+    if fcntl is None or path in _claimed:
+        return True
+
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _claimed[path] = lock_file
+    return True
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive cross-process lock on `path` (through a `.lock` file next to it)"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
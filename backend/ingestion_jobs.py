@@ -0,0 +1,257 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from pdf_extractor import count_pages
+from metrics import STAGE_SECONDS, ERRORS
+
+INGEST_STAGES = ['parse', 'chunk', 'embed', 'index']
+
+
+class JobQueueFullError(Exception):
+    """Raised when the ingestion queue has no room for another job"""
+
+
+class IngestionJobQueue:
+    """Background worker pool that parses, chunks, embeds and indexes uploaded PDFs"""
+
+    def __init__(self, document_processor, rag_system):
+        self.document_processor = document_processor
+        self.rag_system = rag_system
+
+        self.max_workers = int(os.getenv('INGEST_WORKERS', 2))
+        self.max_pending = int(os.getenv('INGEST_MAX_PENDING', 32))
+        self.max_retained = int(os.getenv('INGEST_JOB_RETENTION', 1000))
+        self.batch_size = int(os.getenv('INGEST_BATCH_SIZE', 64))
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='ingest'
+        )
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._pending = 0
+
+    def submit(self, filepath: str, filename: str) -> Dict:
+        """Queue a saved PDF for ingestion and return the new job record"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFullError(
+                    f"Ingestion queue is full ({self.max_pending} jobs pending)"
+                )
+
+            job_id = str(uuid.uuid4())
+            job = {
+                'job_id': job_id,
+                'filename': filename,
+                'filepath': filepath,
+                'status': 'queued',
+                'stage': None,
+                'progress': 0.0,
+                'pages_total': None,
+                'pages_processed': 0,
+                'chunks_processed': 0,
+                'embed_chunks_per_second': None,
+                'error': None,
+                'stages': {
+                    stage: {'status': 'pending', 'seconds': None}
+                    for stage in INGEST_STAGES
+                },
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None
+            }
+            self._jobs[job_id] = job
+            self._pending += 1
+            self._evict_finished()
+
+        self._executor.submit(self._run, job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a snapshot of a job, or None if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {key: value for key, value in job.items() if key != 'filepath'}
+            snapshot['stages'] = {name: dict(info) for name, info in job['stages'].items()}
+            return snapshot
+
+    def get_progress(self, job_id: str) -> Optional[Dict]:
+        """Return the compact progress view of a job, or None if it is unknown"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        return {
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'stage': job['stage'],
+            'progress': job['progress'],
+            'stage_timings': {
+                name: info['seconds'] for name, info in job['stages'].items()
+                if info['seconds'] is not None
+            }
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and optionally wait for running ones"""
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id: str):
+        """Stream pages through the chunk, embed and index stages for a single job"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job['status'] = 'running'
+            job['started_at'] = time.time()
+            filepath = job['filepath']
+            metadata = {'filename': job['filename'], 'filepath': filepath}
+
+        # IDs of every chunk this job may have written, so a failed job can be rolled back
+        indexed_ids = []
+        previous_ids = set()
+
+        try:
+            # Chunks from an earlier upload of the same file are left in place on failure
+            previous_ids = set(self.rag_system.document_catalog.chunk_ids(metadata['filename']))
+
+            total_pages = count_pages(filepath)
+            self._update(job_id, pages_total=total_pages)
+
+            pages = self.document_processor.iter_pages(filepath)
+            batch = []
+            chunk_id = 0
+            pages_processed = 0
+
+            while True:
+                page = self._timed_stage(job_id, 'parse', next, pages, None)
+                if page is None:
+                    break
+
+                page_num, page_text = page
+                page_chunks = self._timed_stage(
+                    job_id, 'chunk', self.document_processor.split_page,
+                    page_text, page_num, filepath, first_chunk_id=chunk_id
+                )
+                chunk_id += len(page_chunks)
+                batch.extend(page_chunks)
+
+                # Hand chunks to the embedder as soon as a batch is ready
+                if len(batch) >= self.batch_size:
+                    self._index_batch(job_id, batch, metadata, indexed_ids)
+                    batch = []
+
+                pages_processed += 1
+                self._update(
+                    job_id,
+                    pages_processed=pages_processed,
+                    progress=round(pages_processed / max(total_pages, 1), 2)
+                )
+
+            if batch:
+                self._index_batch(job_id, batch, metadata, indexed_ids)
+
+            # A revised PDF uploaded under the same name replaces the old version's chunks
+            self._timed_stage(
+                job_id, 'index', self.rag_system.remove_stale_chunks, metadata['filename'], indexed_ids
+            )
+
+            with self._lock:
+                job = self._jobs[job_id]
+                for info in job['stages'].values():
+                    info['status'] = 'completed'
+                job.update(status='completed', stage=None, progress=1.0)
+
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {str(e)}")
+            ERRORS.inc(component='ingest')
+            self._roll_back(job_id, [
+                chunk_id for chunk_id in dict.fromkeys(indexed_ids) if chunk_id not in previous_ids
+            ])
+            with self._lock:
+                job = self._jobs[job_id]
+                if job['stage']:
+                    job['stages'][job['stage']]['status'] = 'failed'
+                job.update(status='failed', error=str(e))
+
+        finally:
+            self._save_indexes(job_id)
+            with self._lock:
+                self._jobs[job_id]['finished_at'] = time.time()
+                self._pending -= 1
+
+    def _index_batch(self, job_id: str, batch: List, metadata: Dict, indexed_ids: List[str]):
+        """Embed and index one batch of chunks, recording their IDs before anything is written"""
+        for doc in batch:
+            doc.metadata.update(metadata)
+        indexed_ids.extend(self.rag_system.chunk_ids(batch))
+
+        embeddings = self._timed_stage(job_id, 'embed', self.rag_system.embed_documents, batch)
+        self._timed_stage(
+            job_id, 'index', self.rag_system.add_documents, batch,
+            metadata=metadata, embeddings=embeddings
+        )
+        with self._lock:
+            job = self._jobs[job_id]
+            job['chunks_processed'] += len(batch)
+            embed_seconds = job['stages']['embed']['seconds']
+            if embed_seconds:
+                job['embed_chunks_per_second'] = round(job['chunks_processed'] / embed_seconds, 1)
+
+    def _roll_back(self, job_id: str, chunk_ids: List[str]):
+        """Remove the chunks a failed job already indexed, so none of its document stays searchable"""
+        if not chunk_ids:
+            return
+        try:
+            self.rag_system.delete_chunks(chunk_ids)
+            print(f"Ingestion job {job_id}: removed {len(chunk_ids)} chunks indexed before the failure")
+        except Exception as e:
+            print(f"Ingestion job {job_id}: could not remove partially indexed chunks: {str(e)}")
+            ERRORS.inc(component='ingest')
+
+    def _save_indexes(self, job_id: str):
+        """Write the side indexes once per job rather than after every batch"""
+        try:
+            self.rag_system.save_indexes()
+        except Exception as e:
+            print(f"Ingestion job {job_id}: could not save indexes: {str(e)}")
+            ERRORS.inc(component='ingest')
+
+    def _timed_stage(self, job_id: str, stage: str, func, *args, **kwargs):
+        """Run one step of a stage, adding its wall-clock time to the stage total"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job['stage'] = stage
+            job['stages'][stage]['status'] = 'running'
+
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_SECONDS.observe(elapsed, pipeline='ingest', stage=stage)
+            with self._lock:
+                info = self._jobs[job_id]['stages'][stage]
+                info['seconds'] = round((info['seconds'] or 0.0) + elapsed, 4)
+
+    def _update(self, job_id: str, **fields):
+        """Apply field updates to a job under the lock"""
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _evict_finished(self):
+        """Drop the oldest finished jobs beyond the retention limit (lock must be held)"""
+        excess = len(self._jobs) - self.max_retained
+        if excess <= 0:
+            return
+
+        for job_id in list(self._jobs.keys()):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]['status'] in ('completed', 'failed'):
+                del self._jobs[job_id]
+                excess -= 1
@@ -0,0 +1,52 @@
+from typing import Dict, List, Set
+
+
+class KeywordMatcher:
+    """Finds groups of substring keywords in already lower-cased text.
+
+    Equivalent to checking `keyword in text` for every keyword. With pyahocorasick
+    installed, all keywords are compiled into one Aho-Corasick automaton and the
+    text is scanned once regardless of vocabulary size; otherwise the keyword
+    tuples are built once and scanned with `in`. (A combined regex alternation is
+    slower than both in CPython, since it tries every alternative at each position.)
+    """
+
+    def __init__(self, groups: Dict[str, List[str]]):
+        self.groups = {group: tuple(keywords) for group, keywords in groups.items()}
+        self.keywords = tuple(dict.fromkeys(kw for kws in self.groups.values() for kw in kws))
+
+        self._automaton = None
+        try:
+            import ahocorasick
+            automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                automaton.add_word(keyword, keyword)
+            automaton.make_automaton()
+            self._automaton = automaton
+        except ImportError:
+            pass
+
+    def contains_any(self, text: str) -> bool:
+        """Whether any keyword occurs in the text"""
+        if self._automaton is not None:
+            return next(self._automaton.iter(text), None) is not None
+        return any(keyword in text for keyword in self.keywords)
+
+    def find_keywords(self, text: str) -> Set[str]:
+        """Every keyword occurring in the text"""
+        if self._automaton is not None:
+            return {keyword for _, keyword in self._automaton.iter(text)}
+        return {keyword for keyword in self.keywords if keyword in text}
+
+    def find(self, text: str) -> Dict[str, List[str]]:
+        """Keywords found per group, in the order they were configured; empty groups are omitted"""
+        found = self.find_keywords(text)
+        if not found:
+            return {}
+
+        result = {}
+        for group, keywords in self.groups.items():
+            matched = [keyword for keyword in keywords if keyword in found]
+            if matched:
+                result[group] = matched
+        return result
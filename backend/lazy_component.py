@@ -0,0 +1,70 @@
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class LazyComponent:
+    """Builds a heavy component on first use and forwards attribute access to it.
+
+    The factory does its own imports, so importing the module that declares the
+    component stays cheap. Concurrent first uses wait for a single build.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+        self._error: Optional[str] = None
+        self._load_seconds: Optional[float] = None
+
+    def get(self) -> Any:
+        """Return the component, building it if needed"""
+        instance = self._instance
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if self._instance is None:
+                start = time.perf_counter()
+                try:
+                    self._instance = self._factory()
+                    self._error = None
+                except Exception as e:
+                    self._error = str(e)
+                    raise
+                self._load_seconds = time.perf_counter() - start
+                print(f"Loaded {self._name} in {self._load_seconds:.2f}s")
+            return self._instance
+
+    @property
+    def ready(self) -> bool:
+        return self._instance is not None
+
+    def status(self) -> Dict:
+        return {
+            'ready': self.ready,
+            'loading': self._lock.locked() and not self.ready,
+            'load_seconds': round(self._load_seconds, 3) if self._load_seconds is not None else None,
+            'error': self._error
+        }
+
+    def __getattr__(self, name: str):
+        # Only reached for attributes not defined on the proxy itself
+        return getattr(self.get(), name)
+
+
+def warm_up(components: List[LazyComponent], after: Callable[[], None] = None) -> threading.Thread:
+    """Build components in a background thread so the first request does not pay for it"""
+    def run():
+        try:
+            for component in components:
+                component.get()
+            if after is not None:
+                after()
+        except Exception as e:
+            print(f"Warm-up failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
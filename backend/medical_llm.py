@@ -1,19 +1,77 @@
 import os
-from typing import List, Dict, Any
+import time
+import random
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Iterator
 from langchain.schema import Document
 from langchain.llms import OpenAI
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
+from context_builder import TokenCounter, ContextBuilder
+from keyword_matcher import KeywordMatcher
+from metrics import span, record_stage, LLM_FALLBACKS, ERRORS
+
+HUMAN_PROMPT_TEMPLATE = """
+Context from Medical Documents:
+{context}
+
+Previous Conversation:
+{history}
+
+Current Question: {question}
+
+Please provide a helpful, accurate response based on the medical context provided. If the documents don't contain relevant information, clearly state this and provide general medical guidance while emphasizing the need for professional consultation.
+"""
+
+FALLBACK_WITH_DOCUMENTS_TEMPLATE = """Based on the medical documents in our database, here's relevant information for your query:
+
+{document_context}
+
+⚠️ **Important Medical Disclaimer**: 
+This information is retrieved from uploaded medical documents and is for educational purposes only. It should not replace professional medical advice, diagnosis, or treatment. Always consult with qualified healthcare providers for medical decisions.
+
+🔍 **Recommendation**: For personalized medical advice regarding "{user_message}", please consult with your healthcare provider who can evaluate your specific situation.
+
+💡 **Note**: This response is generated using document retrieval. For more detailed analysis, please ensure relevant medical documents are uploaded to the system."""
+
+FALLBACK_NO_DOCUMENTS_TEMPLATE = """I understand you're asking about: "{user_message}"
+
+Currently, I don't have specific medical documents uploaded that directly address your question. To provide you with evidence-based information, please:
+
+1. **Upload relevant medical documents** such as:
+   - Treatment guidelines
+   - Research papers
+   - Clinical protocols
+   - Drug information sheets
+
+2. **Consult healthcare professionals** for personalized medical advice
+
+⚠️ **Important**: This AI system requires uploaded medical documents to provide specific information. For immediate medical concerns, please contact your healthcare provider or emergency services.
+
+🔧 **System Status**: Currently operating in document-retrieval mode. Upload medical PDFs to enable comprehensive responses."""
+
+URGENCY_MATCHER = KeywordMatcher({
+    'urgent': [
+        'emergency', 'urgent', 'severe pain', 'chest pain', 'difficulty breathing',
+        'unconscious', 'bleeding', 'stroke', 'heart attack', 'overdose', 'poisoning'
+    ],
+    'moderate': ['pain', 'symptoms', 'side effects']
+})
 
 class MedicalLLM:
     """Medical-focused Language Model for generating responses"""
     
     def __init__(self):
         self.model_name = os.getenv('LLM_MODEL', 'gpt-3.5-turbo')
+        self.provider = os.getenv('LLM_PROVIDER', 'openai').lower()
         
         # Check if OpenAI API key is available
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        if not self.openai_api_key:
+        if self.provider == 'fake':
+            from fake_llm import FakeChatModel
+            print("Using local fake LLM (LLM_PROVIDER=fake)")
+            self.llm = FakeChatModel()
+        elif not self.openai_api_key:
             print("Warning: OPENAI_API_KEY not found. Using fallback responses.")
             self.llm = None
         else:
@@ -25,6 +83,23 @@ class MedicalLLM:
             )
         
         self.system_prompt = self._create_system_prompt()
+        
+        # Compiled once and reused for every request
+        self.prompt = ChatPromptTemplate.from_messages([
+            SystemMessagePromptTemplate.from_template(self.system_prompt),
+            HumanMessagePromptTemplate.from_template(HUMAN_PROMPT_TEMPLATE)
+        ])
+        
+        # Context and history are packed into a prompt token budget for this model
+        self.token_counter = TokenCounter(self.model_name)
+        self.context_builder = ContextBuilder(self.token_counter)
+        # Token cost of the system prompt and template text, excluding the per-request fields
+        self.fixed_prompt_tokens = self.token_counter.count(
+            self.system_prompt + HUMAN_PROMPT_TEMPLATE.format(context="", history="", question="")
+        )
+        
+        # Upper bound on a single upstream call in the async serving path
+        self.llm_timeout = float(os.getenv('LLM_TIMEOUT_SECONDS', 60))
     
     def _create_system_prompt(self) -> str:
         """Create a comprehensive system prompt for medical assistance"""
@@ -51,81 +126,157 @@ SAFETY:
 
 CONTEXT: You have access to medical documents including treatment guidelines, drug interaction information, lab result documentation, and medical research papers."""
     
-    def generate_response(self, user_message: str, context_documents: List[Document], chat_history: List[Dict] = None) -> str:
-        """Generate a medical response using RAG context"""
+    def generate_response(self, user_message: str, context_documents: List[Document], chat_history: List[Dict] = None, usage: Dict = None,
+                          max_attempts: int = 1, backoff_seconds: float = 1.0) -> str:
+        """Generate a medical response using RAG context.
+        
+        With max_attempts > 1, failed LLM calls are retried with jittered exponential backoff.
+        """
         
         # If no LLM available, use fallback
         if not self.llm:
-            return self._generate_fallback_response(user_message, context_documents)
+            return self._generate_fallback_response(user_message, context_documents, usage=usage)
         
         try:
-            # Prepare context from documents
-            context = self._prepare_context(context_documents)
+            messages = self._build_messages(user_message, context_documents, chat_history, usage)
             
-            # Prepare chat history
-            history_text = self._prepare_history(chat_history or [])
+            for attempt in range(max(1, max_attempts)):
+                try:
+                    with span('chat', 'llm'):
+                        response = self.llm(messages)
+                    return response.content
+                except Exception as e:
+                    if attempt + 1 >= max(1, max_attempts):
+                        raise
+                    delay = backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.5)
+                    print(f"LLM call failed ({str(e)}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
             
-            # Create the prompt
-            prompt = ChatPromptTemplate.from_messages([
-                SystemMessagePromptTemplate.from_template(self.system_prompt),
-                HumanMessagePromptTemplate.from_template("""
-Context from Medical Documents:
-{context}
-
-Previous Conversation:
-{history}
-
-Current Question: {question}
-
-Please provide a helpful, accurate response based on the medical context provided. If the documents don't contain relevant information, clearly state this and provide general medical guidance while emphasizing the need for professional consultation.
-""")
-            ])
+        except Exception as e:
+            print(f"Error generating LLM response: {str(e)}")
+            ERRORS.inc(component='llm')
+            return self._generate_fallback_response(user_message, context_documents, reason='llm_error', usage=usage)
+    
+    def stream_response(self, user_message: str, context_documents: List[Document], chat_history: List[Dict] = None, usage: Dict = None) -> Iterator[str]:
+        """Yield the response text incrementally as the model produces it"""
+        
+        # If no LLM available, the fallback is sent in one piece
+        if not self.llm:
+            yield self._generate_fallback_response(user_message, context_documents, usage=usage)
+            return
+        
+        started = False
+        try:
+            messages = self._build_messages(user_message, context_documents, chat_history, usage)
             
-            # Generate response
-            messages = prompt.format_messages(
-                context=context,
-                history=history_text,
-                question=user_message
-            )
+            # Only time spent waiting on the model counts; time the caller spends sending
+            # each token to the client is excluded
+            stream = iter(self.llm.stream(messages))
+            upstream_seconds = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    chunk = next(stream, None)
+                    upstream_seconds += time.perf_counter() - start
+                    if chunk is None:
+                        break
+                    if chunk.content:
+                        started = True
+                        yield chunk.content
+            finally:
+                record_stage('chat', 'llm', upstream_seconds)
+            
+        except Exception as e:
+            print(f"Error streaming LLM response: {str(e)}")
+            ERRORS.inc(component='llm')
+            # Only fall back if the client has not already received part of an answer
+            if started and usage is not None:
+                usage['incomplete'] = True
+            if not started:
+                yield self._generate_fallback_response(user_message, context_documents, reason='llm_error', usage=usage)
+    
+    async def agenerate_response(self, user_message: str, context_documents: List[Document], chat_history: List[Dict] = None, usage: Dict = None) -> str:
+        """Async variant of generate_response that awaits the LLM instead of blocking a thread"""
+        
+        # If no LLM available, use fallback
+        if not self.llm:
+            return self._generate_fallback_response(user_message, context_documents, usage=usage)
+        
+        try:
+            messages = self._build_messages(user_message, context_documents, chat_history, usage)
             
-            response = self.llm(messages)
+            with span('chat', 'llm'):
+                response = await asyncio.wait_for(self.llm.ainvoke(messages), timeout=self.llm_timeout)
             return response.content
             
         except Exception as e:
-            print(f"Error generating LLM response: {str(e)}")
-            return self._generate_fallback_response(user_message, context_documents)
+            print(f"Error generating LLM response: {str(e) or type(e).__name__}")
+            ERRORS.inc(component='llm')
+            return self._generate_fallback_response(user_message, context_documents, reason='llm_error', usage=usage)
     
-    def _prepare_context(self, documents: List[Document]) -> str:
-        """Prepare context from retrieved documents"""
-        if not documents:
-            return "No relevant medical documents found for this query."
-        
-        context_parts = []
-        for i, doc in enumerate(documents, 1):
-            filename = doc.metadata.get('filename', 'Unknown document')
-            chunk_id = doc.metadata.get('chunk_id', '')
-            
-            context_parts.append(f"""
-Document {i}: {filename} (Section {chunk_id})
-Content: {doc.page_content[:800]}...
-""")
+    async def astream_response(self, user_message: str, context_documents: List[Document], chat_history: List[Dict] = None, usage: Dict = None) -> AsyncIterator[str]:
+        """Async variant of stream_response"""
         
-        return "\n".join(context_parts)
-    
-    def _prepare_history(self, chat_history: List[Dict]) -> str:
-        """Prepare chat history for context"""
-        if not chat_history:
-            return "No previous conversation."
+        # If no LLM available, the fallback is sent in one piece
+        if not self.llm:
+            yield self._generate_fallback_response(user_message, context_documents, usage=usage)
+            return
         
-        history_parts = []
-        for exchange in chat_history[-3:]:  # Last 3 exchanges
-            history_parts.append(f"User: {exchange.get('user', '')}")
-            history_parts.append(f"Assistant: {exchange.get('assistant', '')}")
+        started = False
+        try:
+            messages = self._build_messages(user_message, context_documents, chat_history, usage)
+            
+            stream = self.llm.astream(messages).__aiter__()
+            upstream_seconds = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        chunk = await stream.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        upstream_seconds += time.perf_counter() - start
+                    if chunk.content:
+                        started = True
+                        yield chunk.content
+            finally:
+                record_stage('chat', 'llm', upstream_seconds)
+            
+        except Exception as e:
+            print(f"Error streaming LLM response: {str(e)}")
+            ERRORS.inc(component='llm')
+            # Only fall back if the client has not already received part of an answer
+            if started and usage is not None:
+                usage['incomplete'] = True
+            if not started:
+                yield self._generate_fallback_response(user_message, context_documents, reason='llm_error', usage=usage)
+    
+    def _build_messages(self, user_message: str, context_documents: List[Document], chat_history: List[Dict] = None, usage: Dict = None) -> List:
+        """Assemble the chat messages for a RAG request.
         
-        return "\n".join(history_parts)
+        If a usage dict is passed it is filled with the prompt token accounting.
+        """
+        with span('chat', 'prompt_build'):
+            # Pack the most relevant chunks and most recent history into the budget
+            fixed_tokens = self.fixed_prompt_tokens + self.token_counter.count(user_message)
+            context, history_text, prompt_usage = self.context_builder.build(
+                fixed_tokens, context_documents, chat_history or []
+            )
+            if usage is not None:
+                usage.update(prompt_usage)
+            
+            return self.prompt.format_messages(
+                context=context,
+                history=history_text,
+                question=user_message
+            )
     
-    def _generate_fallback_response(self, user_message: str, context_documents: List[Document]) -> str:
+    def _generate_fallback_response(self, user_message: str, context_documents: List[Document], reason: str = 'no_llm', usage: Dict = None) -> str:
         """Generate fallback response when LLM is not available"""
+        LLM_FALLBACKS.inc(reason=reason)
+        if usage is not None:
+            usage['fallback'] = reason
         
         # Check if we have relevant documents
         if context_documents:
@@ -137,46 +288,21 @@ Content: {doc.page_content[:800]}...
             
             document_context = "\n\n".join(doc_info)
             
-            return f"""Based on the medical documents in our database, here's relevant information for your query:
-
-{document_context}
-
-⚠️ **Important Medical Disclaimer**: 
-This information is retrieved from uploaded medical documents and is for educational purposes only. It should not replace professional medical advice, diagnosis, or treatment. Always consult with qualified healthcare providers for medical decisions.
-
-🔍 **Recommendation**: For personalized medical advice regarding "{user_message}", please consult with your healthcare provider who can evaluate your specific situation.
-
-💡 **Note**: This response is generated using document retrieval. For more detailed analysis, please ensure relevant medical documents are uploaded to the system."""
+            return FALLBACK_WITH_DOCUMENTS_TEMPLATE.format(
+                document_context=document_context,
+                user_message=user_message
+            )
 
         else:
-            return f"""I understand you're asking about: "{user_message}"
-
-Currently, I don't have specific medical documents uploaded that directly address your question. To provide you with evidence-based information, please:
-
-1. **Upload relevant medical documents** such as:
-   - Treatment guidelines
-   - Research papers
-   - Clinical protocols
-   - Drug information sheets
-
-2. **Consult healthcare professionals** for personalized medical advice
-
-⚠️ **Important**: This AI system requires uploaded medical documents to provide specific information. For immediate medical concerns, please contact your healthcare provider or emergency services.
-
-🔧 **System Status**: Currently operating in document-retrieval mode. Upload medical PDFs to enable comprehensive responses."""
+            return FALLBACK_NO_DOCUMENTS_TEMPLATE.format(user_message=user_message)
     
     def classify_medical_urgency(self, message: str) -> str:
         """Classify the urgency level of a medical query"""
-        urgent_keywords = [
-            'emergency', 'urgent', 'severe pain', 'chest pain', 'difficulty breathing',
-            'unconscious', 'bleeding', 'stroke', 'heart attack', 'overdose', 'poisoning'
-        ]
-        
-        message_lower = message.lower()
+        found = URGENCY_MATCHER.find(message.lower())
         
-        if any(keyword in message_lower for keyword in urgent_keywords):
+        if 'urgent' in found:
             return "urgent"
-        elif any(word in message_lower for word in ['pain', 'symptoms', 'side effects']):
+        elif 'moderate' in found:
             return "moderate"
         else:
             return "routine"
@@ -0,0 +1,219 @@
+import os
+import time
+import threading
+import contextvars
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{str(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[str]]):
+        """Register a callback producing extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"Metrics collector failed: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'medbot_stage_seconds', 'Time spent in each stage of the chat and ingest pipelines', ('pipeline', 'stage')
+)
+REQUEST_SECONDS = registry.histogram(
+    'medbot_request_seconds', 'HTTP request latency', ('endpoint', 'method', 'status')
+)
+LLM_FALLBACKS = registry.counter(
+    'medbot_llm_fallbacks_total', 'Responses served by the document-only fallback', ('reason',)
+)
+CHUNKS_INGESTED = registry.counter(
+    'medbot_chunks_ingested_total', 'Chunks written to the vector store'
+)
+RERANK_FALLBACKS = registry.counter(
+    'medbot_rerank_fallbacks_total', 'Searches that kept the bi-encoder order', ('reason',)
+)
+ERRORS = registry.counter(
+    'medbot_errors_total', 'Errors caught and reported by component', ('component',)
+)
+
+
+
+def cache_stats_lines(caches: Dict[str, Optional[Dict]]) -> List[str]:
+    """Exposition lines for cache hit/miss counters kept by the caches themselves"""
+    lines = []
+    for result in ('hits', 'misses'):
+        name = f'medbot_cache_{result}_total'
+        lines += [f"# HELP {name} Cache {result} by cache", f"# TYPE {name} counter"]
+        for cache, stats in sorted(caches.items()):
+            if stats is not None:
+                lines.append(f'{name}{{cache="{cache}"}} {stats[result]}')
+    return lines
+
+
+# Stage timings of the current request, collected only when a debug trace is active
+_trace: contextvars.ContextVar = contextvars.ContextVar('medbot_trace', default=None)
+
+
+class _Span:
+    __slots__ = ('pipeline', 'stage', 'start')
+
+    def __init__(self, pipeline: str, stage: str):
+        self.pipeline = pipeline
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record(self.pipeline, self.stage, time.perf_counter() - self.start, _trace.get())
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(pipeline: str, stage: str):
+    """Time a block as one stage; a shared no-op when metrics and tracing are both off"""
+    if not METRICS_ENABLED and _trace.get() is None:
+        return _NOOP_SPAN
+    return _Span(pipeline, stage)
+
+
+def record_stage(pipeline: str, stage: str, seconds: float):
+    """Record a stage timed by the caller, e.g. summed over the reads of a stream"""
+    trace = _trace.get()
+    if METRICS_ENABLED or trace is not None:
+        _record(pipeline, stage, seconds, trace)
+
+
+def _record(pipeline: str, stage: str, seconds: float, trace: Optional[List]):
+    STAGE_SECONDS.observe(seconds, pipeline=pipeline, stage=stage)
+    if trace is not None:
+        trace.append((stage, seconds))
+
+
+def start_trace() -> contextvars.Token:
+    """Start collecting stage timings for the current request"""
+    return _trace.set([])
+
+
+def finish_trace(token: contextvars.Token) -> Optional[str]:
+    """Stop collecting and return the timings as a Server-Timing header value"""
+    trace = _trace.get()
+    _trace.reset(token)
+    if not trace:
+        return None
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in trace)
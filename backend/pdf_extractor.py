@@ -0,0 +1,22 @@
+import PyPDF2
+from typing import List, Optional, Tuple
+
+# Kept free of langchain/torch imports so spawned pool workers start quickly
+
+
+def count_pages(filepath: str) -> int:
+    """Return the number of pages in a PDF"""
+    with open(filepath, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_page_range(filepath: str, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, str]]:
+    """Extract (page_number, text) pairs for pages [start, end) of a PDF"""
+    with open(filepath, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        total_pages = len(pdf_reader.pages)
+        end = total_pages if end is None else min(end, total_pages)
+        return [
+            (page_num + 1, pdf_reader.pages[page_num].extract_text() or "")
+            for page_num in range(start, end)
+        ]
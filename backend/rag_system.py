@@ -1,10 +1,30 @@
 import os
+import json
+import time
+import atexit
 import chromadb
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from langchain.schema import Document
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import Chroma
-import uuid
+from embedding_engine import EmbeddingEngine
+from embedding_cache import EmbeddingCache, content_hash
+from query_cache import TTLCache, normalize_query
+from bm25_index import BM25Index
+from ann_index import create_ann_index, normalize_rows
+from keyword_matcher import KeywordMatcher
+from document_catalog import DocumentCatalog
+from answer_cache import SemanticAnswerCache
+from reranker import CrossEncoderReranker
+from index_files import claim_directory
+from metrics import span, CHUNKS_INGESTED, ERRORS
+
+MEDICAL_CONTEXT_MATCHER = KeywordMatcher({
+    'medical_context': [
+        "medical", "clinical", "treatment", "diagnosis", "patient",
+        "symptom", "condition", "therapy", "medication", "dosage"
+    ]
+})
 
 class RAGSystem:
     """Retrieval-Augmented Generation system for medical documents"""
@@ -13,12 +33,47 @@ class RAGSystem:
         self.embedding_model_name = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
         self.vector_db_path = os.getenv('VECTOR_DB_PATH', './vector_db')
         
+        # chromadb's local store is not safe across processes: each keeps its own HNSW segment,
+        # never sees the others' writes and overwrites their files, so only one process may use it
+        if not claim_directory(self.vector_db_path):
+            raise Exception(
+                f"Error opening vector store: {self.vector_db_path} is in use by another process "
+                "(a running server or bulk_ingest.py); stop it first"
+            )
+        
         # Initialize embeddings
         self.embeddings = HuggingFaceEmbeddings(
             model_name=self.embedding_model_name,
             model_kwargs={'device': 'cpu'}  # Use 'cuda' if you have GPU
         )
         
+        # Batched embedding stage for ingest, sharing the loaded model
+        self.embedding_engine = EmbeddingEngine(self.embeddings.client)
+        
+        # Persistent chunk-hash -> vector cache so re-ingested chunks are not re-embedded
+        self.embedding_cache = None
+        if os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true':
+            self.embedding_cache = EmbeddingCache(
+                os.getenv('EMBEDDING_CACHE_PATH', os.path.join(self.vector_db_path, 'embedding_cache.sqlite3')),
+                self.embedding_model_name
+            )
+        
+        # Query-side caches; retrieval results are tied to the collection version
+        cache_ttl = float(os.getenv('QUERY_CACHE_TTL_SECONDS', 600))
+        self.query_embedding_cache = TTLCache(int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', 2048)), cache_ttl)
+        self.retrieval_cache = TTLCache(int(os.getenv('RETRIEVAL_CACHE_SIZE', 1024)), cache_ttl)
+        self._collection_version = 0
+        
+        # Opt-in reuse of answers to paraphrased questions over the same retrieved chunks
+        self.answer_cache = None
+        self.answer_cache_include_history = os.getenv('ANSWER_CACHE_INCLUDE_HISTORY', 'false').lower() == 'true'
+        if os.getenv('ANSWER_CACHE_ENABLED', 'false').lower() == 'true':
+            self.answer_cache = SemanticAnswerCache(
+                int(os.getenv('ANSWER_CACHE_SIZE', 1000)),
+                float(os.getenv('ANSWER_CACHE_TTL_SECONDS', 3600)),
+                float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.95))
+            )
+        
         # Initialize vector store
         self.vector_store = Chroma(
             persist_directory=self.vector_db_path,
@@ -26,64 +81,424 @@ class RAGSystem:
             collection_name="medical_documents"
         )
         
-        print(f"RAG System initialized with {self.get_document_count()} documents")
+        # Optional in-process ANN index (faiss/hnswlib); 'chroma' searches the collection
+        self.similarity_threshold = float(os.getenv('SIMILARITY_THRESHOLD', 0.3))
+        self.ann_index = create_ann_index(
+            os.getenv('ANN_BACKEND', 'chroma'),
+            self.vector_db_path,
+            self.embeddings.client.get_sentence_embedding_dimension()
+        )
+        document_count = self.get_document_count()
+        if self.ann_index is not None and len(self.ann_index) != document_count:
+            self._rebuild_ann_index()
+        
+        # Local inverted index for exact terms (drug names, lab codes, doses); a count that
+        # does not match the collection means unsaved changes were lost, so it is rebuilt
+        self.rrf_k = int(os.getenv('RRF_K', 60))
+        self.lexical_index = None
+        if os.getenv('HYBRID_SEARCH_ENABLED', 'true').lower() == 'true':
+            self.lexical_index = BM25Index(os.path.join(self.vector_db_path, 'bm25_index.pkl'))
+            if len(self.lexical_index) != document_count:
+                self._rebuild_lexical_index()
+        
+        # The ANN and lexical indexes are written at most once per interval while ingesting;
+        # jobs and bulk runs save them when they finish, and anything left is saved at exit
+        self.index_save_interval = float(os.getenv('INDEX_SAVE_INTERVAL_SECONDS', 30))
+        self._indexes_saved_at = time.monotonic()
+        atexit.register(self.save_indexes)
+        
+        # Optional cross-encoder pass over a wider candidate set, within a latency budget
+        self.reranker = None
+        if os.getenv('RERANK_ENABLED', 'false').lower() == 'true':
+            self.reranker = CrossEncoderReranker()
+        
+        # Per-file chunk IDs, so listing and deleting documents avoid full collection scans
+        self.document_catalog = DocumentCatalog(os.path.join(self.vector_db_path, 'document_catalog.sqlite3'))
+        if len(self.document_catalog) == 0 and document_count > 0:
+            self._rebuild_document_catalog()
+        
+        print(f"RAG System initialized with {document_count} documents")
     
-    def add_documents(self, documents: List[Document], metadata: Dict = None):
-        """Add documents to the vector database"""
+    def add_documents(self, documents: List[Document], metadata: Dict = None, embeddings: List[List[float]] = None) -> List[str]:
+        """Add documents to the vector database, returning the stored chunk IDs"""
         try:
             # Add additional metadata if provided
             if metadata:
                 for doc in documents:
                     doc.metadata.update(metadata)
             
-            # Generate unique IDs for documents
-            ids = [str(uuid.uuid4()) for _ in documents]
+            # Derive deterministic IDs so re-uploads overwrite instead of duplicating
+            ids = []
+            for doc in documents:
+                doc.metadata['content_hash'] = content_hash(doc.page_content)
+                ids.append(self._chunk_id(doc))
+            
+            # Embed through the batched engine unless embeddings were precomputed
+            if embeddings is None:
+                embeddings = self.embed_documents(documents)
+            
+            # Drop repeats within the batch; Chroma rejects duplicate IDs in one call
+            unique = {}
+            for chunk_id, doc, embedding in zip(ids, documents, embeddings):
+                unique.setdefault(chunk_id, (doc, embedding))
             
             # Add to vector store
-            self.vector_store.add_documents(documents, ids=ids)
+            self.vector_store._collection.upsert(
+                ids=list(unique.keys()),
+                embeddings=[embedding for _, embedding in unique.values()],
+                metadatas=[doc.metadata for doc, _ in unique.values()],
+                documents=[doc.page_content for doc, _ in unique.values()]
+            )
+            
+            # Keep the ANN and lexical indexes in step with the vector store
+            if self.ann_index is not None:
+                self.ann_index.add(list(unique.keys()), [embedding for _, embedding in unique.values()])
+            if self.lexical_index is not None:
+                self.lexical_index.add((chunk_id, doc.page_content) for chunk_id, (doc, _) in unique.items())
+            self.save_indexes(force=False)
+            self.document_catalog.add_chunks(
+                (chunk_id, doc.metadata.get('filename', 'Unknown'), doc.metadata.get('document_type', 'unknown'))
+                for chunk_id, (doc, _) in unique.items()
+            )
             
             # Persist the changes
             self.vector_store.persist()
+            self._invalidate_retrieval_cache()
+            if self.answer_cache is not None:
+                self.answer_cache.invalidate(unique.keys())
+            CHUNKS_INGESTED.inc(len(unique))
             
-            print(f"Added {len(documents)} document chunks to vector database")
+            print(f"Added {len(unique)} document chunks to vector database")
+            return list(unique.keys())
             
         except Exception as e:
             raise Exception(f"Error adding documents to vector store: {str(e)}")
     
-    def search_similar_documents(self, query: str, k: int = 3, score_threshold: float = 0.7) -> List[Document]:
+    def embed_documents(self, documents: List[Document]) -> List[List[float]]:
+        """Compute embeddings for document chunks without storing them"""
+        try:
+            texts = [doc.page_content for doc in documents]
+            if self.embedding_cache is None:
+                return self.embedding_engine.embed(texts)
+            
+            # Only embed chunks the cache has never seen
+            keys = [self.embedding_cache.key_for(text) for text in texts]
+            cached = self.embedding_cache.get_many(keys)
+            
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in cached:
+                    missing.setdefault(key, text)
+            
+            if missing:
+                fresh = dict(zip(missing.keys(), self.embedding_engine.embed(list(missing.values()))))
+                self.embedding_cache.put_many(fresh)
+                cached.update(fresh)
+            
+            return [cached[key] for key in keys]
+            
+        except Exception as e:
+            raise Exception(f"Error embedding documents: {str(e)}")
+    
+    def _chunk_id(self, doc: Document) -> str:
+        """Deterministic chunk ID from the owning file and the chunk text"""
+        filename = doc.metadata.get('filename', doc.metadata.get('source', ''))
+        return content_hash(f"{filename}\x00{doc.metadata['content_hash']}")[:32]
+    
+    def search_similar_documents(self, query: str, k: int = 3, score_threshold: float = None) -> List[Document]:
         """Search for similar documents using semantic similarity"""
+        return self.search_batch([query], k, score_threshold)[0]
+    
+    def search_batch(self, queries: List[str], k: int = 3, score_threshold: float = None) -> List[List[Document]]:
+        """Search for several queries with one embedding pass and one vector store query"""
         try:
-            # Enhance query for medical context
-            enhanced_query = self._enhance_medical_query(query)
+            # Minimum cosine similarity for a dense hit
+            if score_threshold is None:
+                score_threshold = self.similarity_threshold
             
-            # Perform similarity search
-            results = self.vector_store.similarity_search_with_score(
-                enhanced_query, 
-                k=k
-            )
+            # Enhance queries for medical context
+            with span('chat', 'enhance_query'):
+                enhanced_queries = [self._prepare_query(query) for query in queries]
             
-            # Filter by score threshold and return documents
-            filtered_results = [
-                doc for doc, score in results 
-                if score >= score_threshold
-            ]
+            # Repeat questions are served without touching the model or the index
+            version = self._collection_version
+            results: List[List[Document]] = [None] * len(queries)
+            pending = []
+            for i, enhanced_query in enumerate(enhanced_queries):
+                cached = self.retrieval_cache.get(
+                    self._retrieval_key(queries[i], enhanced_query, k, score_threshold), version
+                )
+                if cached is not None:
+                    results[i] = list(cached)
+                else:
+                    pending.append(i)
             
-            return filtered_results[:k]
+            if pending:
+                # Perform similarity search, over-fetching so duplicates can be dropped
+                fetch_k = k * 2
+                if self.reranker is not None:
+                    fetch_k = max(fetch_k, self.reranker.candidates)
+                with span('chat', 'embed_query'):
+                    query_embeddings = self.embed_queries([enhanced_queries[i] for i in pending])
+                with span('chat', 'dense_search'):
+                    dense_results = self._dense_search(query_embeddings, fetch_k)
+                
+                for i, dense in zip(pending, dense_results):
+                    results[i] = self._rank_candidates(
+                        queries[i], enhanced_queries[i], dense, k, score_threshold, fetch_k, version
+                    )
+            
+            return results
             
         except Exception as e:
             print(f"Error in similarity search: {str(e)}")
-            return []
+            ERRORS.inc(component='retrieval')
+            return [[] for _ in queries]
     
-    def _enhance_medical_query(self, query: str) -> str:
-        """Enhance query with medical context for better retrieval"""
-        medical_context_words = [
-            "medical", "clinical", "treatment", "diagnosis", "patient", 
-            "symptom", "condition", "therapy", "medication", "dosage"
+    def _rank_candidates(self, query: str, enhanced_query: str, dense: List[Tuple[str, Document, float]],
+                         k: int, score_threshold: float, fetch_k: int, version: int) -> List[Document]:
+        """Filter, fuse, de-duplicate and rerank one query's dense hits into its top k"""
+        # Filter by score threshold
+        candidates = [
+            (chunk_id, doc) for chunk_id, doc, score in dense
+            if score >= score_threshold
         ]
         
+        # Fuse with exact-term matches from the lexical index; it gets the user's own words,
+        # since the "medical clinical" prefix added for embedding would match chunks at random
+        if self.lexical_index is not None:
+            with span('chat', 'lexical_search'):
+                lexical_results = self.lexical_index.search(normalize_query(query), fetch_k)
+            with span('chat', 'fuse'):
+                candidates = self._fuse_rankings(candidates, lexical_results)
+        
+        # Collapse chunks shared across documents
+        filtered_results = []
+        seen_hashes = set()
+        for chunk_id, doc in candidates:
+            chunk_hash = doc.metadata.get('content_hash')
+            if chunk_hash and chunk_hash in seen_hashes:
+                continue
+            seen_hashes.add(chunk_hash)
+            filtered_results.append(doc)
+        
+        # Re-score the candidates; bi-encoder order is kept (and not cached) on timeout
+        if self.reranker is not None:
+            with span('chat', 'rerank'):
+                reranked = self.reranker.rerank(query, filtered_results[:self.reranker.candidates])
+            if reranked is None:
+                return filtered_results[:k]
+            filtered_results = reranked
+        
+        filtered_results = filtered_results[:k]
+        self.retrieval_cache.put(
+            self._retrieval_key(query, enhanced_query, k, score_threshold), tuple(filtered_results), version
+        )
+        return filtered_results
+    
+    def _retrieval_key(self, query: str, enhanced_query: str, k: int, score_threshold: float) -> Tuple:
+        """Retrieval cache key for one query's results"""
+        # BM25 and the reranker see the query without the enhancement, so "metformin" and
+        # "medical clinical metformin" must not share an entry
+        return (enhanced_query, normalize_query(query), k, score_threshold)
+    
+    def _dense_search(self, query_embeddings: List[List[float]], k: int) -> List[List[Tuple[str, Document, float]]]:
+        """Nearest-neighbour search returning, per query, (chunk_id, document, cosine similarity) best first"""
+        collection = self.vector_store._collection
+        
+        if self.ann_index is not None:
+            all_hits = [self.ann_index.search(query_embedding, k) for query_embedding in query_embeddings]
+            hit_ids = list({chunk_id for hits in all_hits for chunk_id, _ in hits})
+            if not hit_ids:
+                return [[] for _ in query_embeddings]
+            
+            # One fetch for the union of every query's hits
+            fetched = collection.get(ids=hit_ids, include=['documents', 'metadatas'])
+            documents = {
+                chunk_id: Document(page_content=text, metadata=metadata or {})
+                for chunk_id, text, metadata in zip(fetched['ids'], fetched['documents'], fetched['metadatas'])
+            }
+            return [
+                [
+                    (chunk_id, documents[chunk_id], similarity)
+                    for chunk_id, similarity in hits if chunk_id in documents
+                ]
+                for hits in all_hits
+            ]
+        
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            include=['documents', 'metadatas', 'embeddings']
+        )
+        
+        # Chroma's distances only map to cosine for unit vectors, and neither the stored
+        # nor the query embeddings have to be normalized, so cosine is computed directly
+        all_hits = []
+        for query_embedding, ids, texts, metadatas, embeddings in zip(
+            query_embeddings, results['ids'], results['documents'], results['metadatas'], results['embeddings']
+        ):
+            if not ids:
+                all_hits.append([])
+                continue
+            similarities = normalize_rows(embeddings) @ normalize_rows(query_embedding)[0]
+            hits = [
+                (chunk_id, Document(page_content=text, metadata=metadata or {}), float(similarity))
+                for chunk_id, text, metadata, similarity in zip(ids, texts, metadatas, similarities)
+            ]
+            hits.sort(key=lambda hit: hit[2], reverse=True)
+            all_hits.append(hits)
+        return all_hits
+    
+    def _fuse_rankings(self, dense: List[Tuple[str, Document]], lexical: List[Tuple[str, float]]) -> List[Tuple[str, Document]]:
+        """Merge dense and lexical rankings with reciprocal rank fusion"""
+        scores = {}
+        for ranking in ([chunk_id for chunk_id, _ in dense], [chunk_id for chunk_id, _ in lexical]):
+            for rank, chunk_id in enumerate(ranking):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        
+        # Lexical-only hits still need their text and metadata
+        documents = dict(dense)
+        missing = [chunk_id for chunk_id in scores if chunk_id not in documents]
+        if missing:
+            fetched = self.vector_store._collection.get(ids=missing, include=['documents', 'metadatas'])
+            for chunk_id, text, metadata in zip(fetched['ids'], fetched['documents'], fetched['metadatas']):
+                documents[chunk_id] = Document(page_content=text, metadata=metadata or {})
+        
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [(chunk_id, documents[chunk_id]) for chunk_id in ranked if chunk_id in documents]
+    
+    def _rebuild_ann_index(self, page_size: int = 5000):
+        """Load every stored embedding into a newly enabled (or out of date) ANN index"""
+        collection = self.vector_store._collection
+        self.ann_index.clear()
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=['embeddings'])
+            if not page['ids']:
+                break
+            self.ann_index.add(page['ids'], page['embeddings'])
+            offset += len(page['ids'])
+        
+        self.ann_index.save()
+        print(f"Built ANN index for {offset} existing chunks")
+    
+    def _rebuild_document_catalog(self, page_size: int = 5000):
+        """Catalog every stored chunk, for collections created before the catalog existed"""
+        collection = self.vector_store._collection
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=['metadatas'])
+            if not page['ids']:
+                break
+            self.document_catalog.add_chunks(
+                (chunk_id, (metadata or {}).get('filename', 'Unknown'), (metadata or {}).get('document_type', 'unknown'))
+                for chunk_id, metadata in zip(page['ids'], page['metadatas'])
+            )
+            offset += len(page['ids'])
+        
+        print(f"Built document catalog for {offset} existing chunks")
+    
+    def _rebuild_lexical_index(self, page_size: int = 5000):
+        """Index every stored chunk, for collections created before hybrid search"""
+        collection = self.vector_store._collection
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=['documents'])
+            if not page['ids']:
+                break
+            self.lexical_index.add(zip(page['ids'], page['documents']))
+            offset += len(page['ids'])
+        
+        self.lexical_index.save()
+        print(f"Built lexical index for {offset} existing chunks")
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a normalized query, reusing recent embeddings of the same text"""
+        return self.embed_queries([query])[0]
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed normalized queries, computing the ones not cached in a single batch"""
+        embeddings = [self.query_embedding_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        if missing:
+            fresh = dict(zip(missing, self.embeddings.embed_documents(missing)))
+            for query, embedding in fresh.items():
+                self.query_embedding_cache.put(query, embedding)
+            embeddings = [fresh[query] if embedding is None else embedding for query, embedding in zip(queries, embeddings)]
+        return embeddings
+    
+    def get_cached_answer(self, query: str, documents: List[Document], chat_history: List[Dict] = None) -> Optional[Dict]:
+        """A stored answer to a near-duplicate of this query over the same documents, or None"""
+        if self.answer_cache is None:
+            return None
+        with span('chat', 'answer_cache'):
+            return self.answer_cache.get(
+                self.embed_query(self._prepare_query(query)),
+                self.chunk_ids(documents),
+                self._history_key(chat_history)
+            )
+    
+    def cache_answer(self, query: str, documents: List[Document], response: str, usage: Dict, chat_history: List[Dict] = None):
+        """Store a complete LLM answer; fallback and interrupted answers are not cached"""
+        if self.answer_cache is None or usage.get('fallback') or usage.get('incomplete'):
+            return
+        self.answer_cache.put(
+            self.embed_query(self._prepare_query(query)),
+            self.chunk_ids(documents),
+            {'response': response, 'usage': dict(usage)},
+            self._history_key(chat_history)
+        )
+    
+    def chunk_ids(self, documents: List[Document]) -> List[str]:
+        """Chunk IDs of documents, as add_documents stores them"""
+        ids = []
+        for doc in documents:
+            if 'content_hash' not in doc.metadata:
+                doc.metadata['content_hash'] = content_hash(doc.page_content)
+            ids.append(self._chunk_id(doc))
+        return ids
+    
+    def _history_key(self, chat_history: List[Dict] = None) -> Optional[str]:
+        """Conversation part of the answer cache key; None keeps the cache stateless"""
+        if not self.answer_cache_include_history or not chat_history:
+            return None
+        return content_hash(json.dumps(chat_history, sort_keys=True))
+    
+    def get_cache_stats(self) -> Dict:
+        """Hit/miss counters for the query-side and ingest-side caches"""
+        return {
+            'query_embedding': self.query_embedding_cache.get_stats(),
+            'retrieval': self.retrieval_cache.get_stats(),
+            'answer': self.answer_cache.get_stats() if self.answer_cache else None,
+            'embedding': self.embedding_cache.get_stats() if self.embedding_cache else None
+        }
+    
+    def save_indexes(self, force: bool = True):
+        """Write changed side indexes to disk; unless forced, at most once per save interval"""
+        now = time.monotonic()
+        if not force and now - self._indexes_saved_at < self.index_save_interval:
+            return
+        self._indexes_saved_at = now
+        if self.ann_index is not None:
+            self.ann_index.save()
+        if self.lexical_index is not None:
+            self.lexical_index.save()
+    
+    def _invalidate_retrieval_cache(self):
+        """Forget cached search results after the collection changes"""
+        self._collection_version += 1
+        self.retrieval_cache.clear()
+    
+    def _prepare_query(self, query: str) -> str:
+        """Enhanced, normalized query text used for retrieval and cache keys"""
+        return normalize_query(self._enhance_medical_query(query))
+    
+    def _enhance_medical_query(self, query: str) -> str:
+        """Enhance query with medical context for better retrieval"""
         # Add medical context if not present
-        query_lower = query.lower()
-        has_medical_context = any(word in query_lower for word in medical_context_words)
+        has_medical_context = MEDICAL_CONTEXT_MATCHER.contains_any(query.lower())
         
         if not has_medical_context:
             query = f"medical clinical {query}"
@@ -99,57 +514,82 @@ class RAGSystem:
         except:
             return 0
     
-    def get_document_list(self) -> List[Dict]:
-        """Get list of all documents with metadata"""
+    def get_document_list(self, offset: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        """Get a page of documents with metadata, and the total number of documents"""
         try:
-            collection = self.vector_store._collection
-            results = collection.get()
-            
-            # Group by source file
-            documents = {}
-            for i, metadata in enumerate(results['metadatas']):
-                filename = metadata.get('filename', 'Unknown')
-                if filename not in documents:
-                    documents[filename] = {
-                        'filename': filename,
-                        'chunks': 0,
-                        'document_type': metadata.get('document_type', 'unknown')
-                    }
-                documents[filename]['chunks'] += 1
-            
-            return list(documents.values())
-            
+            return self.document_catalog.list(offset, limit)
         except Exception as e:
             print(f"Error getting document list: {str(e)}")
-            return []
+            return [], 0
     
-    def delete_document(self, filename: str):
-        """Delete all chunks of a specific document"""
+    def delete_document(self, filename: str) -> int:
+        """Delete all chunks of a specific document, returning how many were removed"""
         try:
-            collection = self.vector_store._collection
-            results = collection.get()
-            
-            # Find IDs of chunks belonging to this document
-            ids_to_delete = []
-            for i, metadata in enumerate(results['metadatas']):
-                if metadata.get('filename') == filename:
-                    ids_to_delete.append(results['ids'][i])
+            # The catalog knows exactly which chunks belong to this document
+            ids_to_delete = self.document_catalog.chunk_ids(filename)
             
             # Delete the chunks
             if ids_to_delete:
-                collection.delete(ids=ids_to_delete)
-                self.vector_store.persist()
+                self._remove_chunks(ids_to_delete)
+                self.document_catalog.remove_document(filename)
+                self.save_indexes()
                 print(f"Deleted {len(ids_to_delete)} chunks for document: {filename}")
+            
+            return len(ids_to_delete)
                 
         except Exception as e:
             raise Exception(f"Error deleting document: {str(e)}")
     
+    def delete_chunks(self, chunk_ids: List[str]) -> int:
+        """Delete individual chunks, dropping documents left without any, and return how many were given"""
+        try:
+            if chunk_ids:
+                self._remove_chunks(chunk_ids)
+                self.document_catalog.remove_chunks(chunk_ids)
+                print(f"Deleted {len(chunk_ids)} chunks")
+            
+            return len(chunk_ids)
+            
+        except Exception as e:
+            raise Exception(f"Error deleting chunks: {str(e)}")
+    
+    def remove_stale_chunks(self, filename: str, current_ids: List[str]) -> int:
+        """Delete a document's chunks that are not part of its latest version"""
+        current = set(current_ids)
+        stale = [chunk_id for chunk_id in self.document_catalog.chunk_ids(filename) if chunk_id not in current]
+        return self.delete_chunks(stale)
+    
+    def _remove_chunks(self, chunk_ids: List[str]):
+        """Remove chunks from the vector store, the ANN and lexical indexes and the caches"""
+        collection = self.vector_store._collection
+        for start in range(0, len(chunk_ids), 5000):
+            collection.delete(ids=chunk_ids[start:start + 5000])
+        if self.ann_index is not None:
+            self.ann_index.delete(chunk_ids)
+        if self.lexical_index is not None:
+            self.lexical_index.delete(chunk_ids)
+        self.save_indexes(force=False)
+        self.vector_store.persist()
+        self._invalidate_retrieval_cache()
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(chunk_ids)
+    
     def clear_all_documents(self):
         """Clear all documents from the vector store"""
         try:
             collection = self.vector_store._collection
             collection.delete()
+            if self.ann_index is not None:
+                self.ann_index.clear()
+                self.ann_index.save()
+            if self.lexical_index is not None:
+                self.lexical_index.clear()
+                self.lexical_index.save()
+            self.document_catalog.clear()
             self.vector_store.persist()
+            self._invalidate_retrieval_cache()
+            if self.answer_cache is not None:
+                self.answer_cache.clear()
             print("All documents cleared from vector database")
             
         except Exception as e:
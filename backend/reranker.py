@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Dict, List, Optional
+from langchain.schema import Document
+from metrics import RERANK_FALLBACKS, ERRORS
+
+
+class CrossEncoderReranker:
+    """Re-scores bi-encoder candidates with a small cross-encoder inside a latency budget.
+
+    All candidates are scored in one batched forward pass on a single worker
+    thread. A call that exceeds the timeout, or arrives while the worker is still
+    busy with an earlier one, keeps the bi-encoder order. The candidate count
+    shrinks while the recent p95 scoring time is above the ceiling and grows back
+    when it is well below it.
+    """
+
+    def __init__(self):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = os.getenv('RERANK_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+        self.max_candidates = int(os.getenv('RERANK_CANDIDATES', 20))
+        self.min_candidates = min(int(os.getenv('RERANK_MIN_CANDIDATES', 6)), self.max_candidates)
+        self.timeout = float(os.getenv('RERANK_TIMEOUT_MS', 300)) / 1000
+        self.p95_ceiling = float(os.getenv('RERANK_P95_CEILING_MS', 150)) / 1000
+        self.model = CrossEncoder(
+            self.model_name,
+            max_length=int(os.getenv('RERANK_MAX_LENGTH', 256)),
+            device='cpu'
+        )
+
+        self.candidates = self.max_candidates
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rerank')
+        self._slot = threading.Semaphore(1)
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=int(os.getenv('RERANK_LATENCY_WINDOW', 50)))
+        self._stats = {'reranked': 0, 'timeouts': 0, 'busy': 0, 'errors': 0}
+
+    def rerank(self, query: str, documents: List[Document]) -> Optional[List[Document]]:
+        """Documents ordered by cross-encoder score, or None if the budget was exceeded"""
+        if len(documents) < 2:
+            return documents
+
+        # Never queue behind a scoring pass that is still running after its timeout
+        if not self._slot.acquire(blocking=False):
+            self._fallback('busy')
+            return None
+
+        try:
+            future = self._executor.submit(self._score, query, [doc.page_content for doc in documents])
+        except Exception:
+            self._slot.release()
+            raise
+
+        try:
+            scores = future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._fallback('timeouts')
+            return None
+        except Exception as e:
+            print(f"Error reranking documents: {str(e)}")
+            ERRORS.inc(component='rerank')
+            self._fallback('errors')
+            return None
+
+        with self._lock:
+            self._stats['reranked'] += 1
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        return [documents[i] for i in order]
+
+    def warm_up(self):
+        """Run one scoring pass so the first request does not pay for lazy initialization"""
+        self.model.predict([("warm up", "warm up")], show_progress_bar=False)
+
+    def get_stats(self) -> Dict:
+        """Current candidate count, recent p95 and fallback counters"""
+        with self._lock:
+            p95 = self._p95()
+            return dict(
+                self._stats,
+                candidates=self.candidates,
+                p95_ms=round(p95 * 1000, 2) if p95 is not None else None,
+                p95_ceiling_ms=self.p95_ceiling * 1000,
+                timeout_ms=self.timeout * 1000
+            )
+
+    def _score(self, query: str, texts: List[str]) -> List[float]:
+        """Score every (query, passage) pair in a single batch"""
+        start = time.perf_counter()
+        try:
+            return self.model.predict(
+                [(query, text) for text in texts],
+                batch_size=len(texts),
+                show_progress_bar=False
+            ).tolist()
+        finally:
+            self._record(time.perf_counter() - start)
+            self._slot.release()
+
+    def _record(self, seconds: float):
+        """Track scoring time and adjust the candidate count against the p95 ceiling"""
+        with self._lock:
+            self._samples.append(seconds)
+            if len(self._samples) < min(20, self._samples.maxlen):
+                return
+
+            p95 = self._p95()
+            if p95 > self.p95_ceiling and self.candidates > self.min_candidates:
+                self.candidates = max(self.min_candidates, int(self.candidates * 0.75))
+                self._samples.clear()
+            elif p95 < self.p95_ceiling / 2 and self.candidates < self.max_candidates:
+                self.candidates = min(self.max_candidates, self.candidates + 2)
+                self._samples.clear()
+
+    def _p95(self) -> Optional[float]:
+        """p95 of recent scoring times (lock must be held)"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _fallback(self, reason: str):
+        with self._lock:
+            self._stats[reason] += 1
+        RERANK_FALLBACKS.inc(reason=reason)
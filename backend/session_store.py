@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+# History is stored compactly as (user, assistant) pairs and expanded on read
+Exchange = Tuple[str, str]
+
+
+def _expand(history: List[Exchange]) -> List[Dict]:
+    return [{'user': user, 'assistant': assistant} for user, assistant in history]
+
+
+class SessionStore(ABC):
+    """Chat history storage shared by the chat endpoints"""
+
+    def __init__(self):
+        self.max_history = int(os.getenv('SESSION_MAX_HISTORY', 10))
+        self.ttl_seconds = float(os.getenv('SESSION_TTL_SECONDS', 86400))
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> List[Dict]:
+        """Return the session's exchanges, oldest first"""
+
+    @abstractmethod
+    def append_exchange(self, session_id: str, user_message: str, response: str):
+        """Atomically append an exchange, keeping only the most recent ones"""
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        """Forget a session's history"""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store bounded by session count, total text size and idle time"""
+
+    def __init__(self):
+        super().__init__()
+        self.max_sessions = int(os.getenv('SESSION_MAX_SESSIONS', 10000))
+        self.max_bytes = int(float(os.getenv('SESSION_MAX_MEMORY_MB', 64)) * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        # session_id -> (history, size, last_access)
+        self._sessions: "OrderedDict[str, Tuple[List[Exchange], int, float]]" = OrderedDict()
+        self._total_bytes = 0
+
+    def get_history(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            if time.time() - entry[2] > self.ttl_seconds:
+                self._drop(session_id)
+                return []
+            return _expand(entry[0])
+
+    def append_exchange(self, session_id: str, user_message: str, response: str):
+        with self._lock:
+            history, old_size, last_access = self._sessions.get(session_id, ([], 0, time.time()))
+            if time.time() - last_access > self.ttl_seconds:
+                history = []
+
+            history = (history + [(user_message, response)])[-self.max_history:]
+            size = sum(len(user.encode('utf-8')) + len(assistant.encode('utf-8')) for user, assistant in history)
+
+            self._total_bytes += size - old_size
+            self._sessions[session_id] = (history, size, time.time())
+            self._sessions.move_to_end(session_id)
+            self._evict()
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        """Remove one session (lock must be held)"""
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    def _evict(self):
+        """Drop least recently used sessions beyond the limits (lock must be held)"""
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes
+        ):
+            session_id, (_, size, _) = self._sessions.popitem(last=False)
+            self._total_bytes -= size
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite-backed store shared by every worker process on the host"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                history TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at)')
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_history(self, session_id: str) -> List[Dict]:
+        row = self._connection().execute(
+            'SELECT history FROM sessions WHERE session_id = ? AND updated_at > ?',
+            (session_id, time.time() - self.ttl_seconds)
+        ).fetchone()
+        return _expand(json.loads(row[0])) if row else []
+
+    def append_exchange(self, session_id: str, user_message: str, response: str):
+        conn = self._connection()
+        now = time.time()
+
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent appends
+        # to the same session from different workers cannot interleave
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT history FROM sessions WHERE session_id = ? AND updated_at > ?',
+                (session_id, now - self.ttl_seconds)
+            ).fetchone()
+            history = json.loads(row[0]) if row else []
+            history = (history + [[user_message, response]])[-self.max_history:]
+
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions (session_id, history, updated_at) VALUES (?, ?, ?)',
+                (session_id, json.dumps(history, separators=(',', ':')), now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        # Expired sessions are invisible to reads; purge them now and then
+        self._writes += 1
+        if self._writes % 500 == 0:
+            conn.execute('DELETE FROM sessions WHERE updated_at <= ?', (now - self.ttl_seconds,))
+
+    def clear(self, session_id: str):
+        self._connection().execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+
+def create_session_store() -> SessionStore:
+    """Build the store selected by SESSION_BACKEND"""
+    backend = os.getenv('SESSION_BACKEND', 'memory').lower()
+    if backend == 'memory':
+        return MemorySessionStore()
+    if backend == 'sqlite':
+        return SQLiteSessionStore(os.getenv('SESSION_DB_PATH', './sessions.sqlite3'))
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
@@ -7,6 +7,8 @@ import { TypingIndicator } from './components/TypingIndicator';
 import { DocumentUpload } from './components/DocumentUpload';
 
 const API_BASE_URL = 'http://localhost:5000/api';
+const INGESTION_POLL_INTERVAL_MS = 1000;
+const INGESTION_TIMEOUT_MS = 10 * 60 * 1000;
 
 interface Message {
   id: string;
@@ -34,29 +36,69 @@ function App() {
     scrollToBottom();
   }, [messages, isTyping]);
 
-  const uploadDocument = async (file: File) => {
+  // Resolves once the document is searchable; throws with a message for the user otherwise
+  const uploadDocument = async (file: File): Promise<void> => {
     const formData = new FormData();
     formData.append('file', file);
 
-    try {
-      const response = await fetch(`${API_BASE_URL}/upload`, {
-        method: 'POST',
-        body: formData,
-      });
+    const response = await fetch(`${API_BASE_URL}/upload`, {
+      method: 'POST',
+      body: formData,
+    });
 
-      if (response.ok) {
-        setUploadedDocs(prev => [...prev, { name: file.name, size: file.size }]);
-        return true;
+    if (!response.ok) {
+      const { error } = await response.json().catch(() => ({ error: undefined }));
+      throw new Error(error || `Upload failed (HTTP ${response.status})`);
+    }
+
+    const { job_id } = await response.json();
+    await waitForIngestion(job_id);
+    setUploadedDocs(prev => [...prev, { name: file.name, size: file.size }]);
+  };
+
+  const waitForIngestion = async (jobId: string): Promise<void> => {
+    const deadline = Date.now() + INGESTION_TIMEOUT_MS;
+
+    while (Date.now() < deadline) {
+      // A status request that hangs counts against the same deadline
+      let response: Response;
+      try {
+        response = await fetch(`${API_BASE_URL}/jobs/${jobId}/progress`, {
+          signal: AbortSignal.timeout(Math.max(deadline - Date.now(), 1)),
+        });
+      } catch (error) {
+        if (error instanceof DOMException && error.name === 'TimeoutError') {
+          break;
+        }
+        throw error;
       }
-    } catch (error) {
-      console.error('Upload failed:', error);
+      if (response.status === 404) {
+        throw new Error('Processing job was lost, possibly because the server restarted');
+      }
+      if (!response.ok) {
+        throw new Error(`Could not check processing status (HTTP ${response.status})`);
+      }
+
+      const { status } = await response.json();
+      if (status === 'completed') {
+        return;
+      }
+      if (status === 'failed') {
+        throw new Error('Document processing failed');
+      }
+
+      await new Promise(resolve => setTimeout(resolve, INGESTION_POLL_INTERVAL_MS));
     }
-    return false;
+
+    throw new Error(`Processing did not finish within ${INGESTION_TIMEOUT_MS / 60000} minutes`);
   };
 
-  const generateResponse = async (userMessage: string): Promise<string> => {
+  const generateResponse = async (
+    userMessage: string,
+    onToken: (token: string) => void
+  ): Promise<void> => {
     try {
-      const response = await fetch(`${API_BASE_URL}/chat`, {
+      const response = await fetch(`${API_BASE_URL}/chat/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -67,12 +109,36 @@ function App() {
         }),
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        return data.response;
-      } else {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to get response from server');
       }
+
+      // Parse the Server-Sent Events stream as it arrives
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop() ?? '';
+
+        for (const rawEvent of events) {
+          const lines = rawEvent.split('\n');
+          const event = lines.find(line => line.startsWith('event: '))?.slice(7);
+          const data = lines.find(line => line.startsWith('data: '))?.slice(6);
+          if (!event || data === undefined) continue;
+
+          if (event === 'token') {
+            onToken(JSON.parse(data).text);
+          } else if (event === 'error') {
+            throw new Error(JSON.parse(data).error);
+          }
+        }
+      }
     } catch (error) {
       console.error('Error generating response:', error);
       throw error;
@@ -90,25 +156,37 @@ function App() {
     setMessages(prev => [...prev, userMessage]);
     setIsTyping(true);
 
+    const assistantId = (Date.now() + 1).toString();
+    let receivedTokens = false;
+
     try {
-      const response = await generateResponse(messageText);
-      
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        text: response,
-        isUser: false,
-        timestamp: new Date(),
-      };
-
-      setMessages(prev => [...prev, assistantMessage]);
+      await generateResponse(messageText, (token) => {
+        if (!receivedTokens) {
+          receivedTokens = true;
+          setIsTyping(false);
+          setMessages(prev => [...prev, {
+            id: assistantId,
+            text: token,
+            isUser: false,
+            timestamp: new Date(),
+          }]);
+          return;
+        }
+
+        setMessages(prev => prev.map(message =>
+          message.id === assistantId ? { ...message, text: message.text + token } : message
+        ));
+      });
     } catch (error) {
-      const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        text: "I'm sorry, I encountered an error while processing your medical query. Please try again or contact support if the issue persists.",
-        isUser: false,
-        timestamp: new Date(),
-      };
-      setMessages(prev => [...prev, errorMessage]);
+      if (!receivedTokens) {
+        const errorMessage: Message = {
+          id: assistantId,
+          text: "I'm sorry, I encountered an error while processing your medical query. Please try again or contact support if the issue persists.",
+          isUser: false,
+          timestamp: new Date(),
+        };
+        setMessages(prev => [...prev, errorMessage]);
+      }
     } finally {
       setIsTyping(false);
     }
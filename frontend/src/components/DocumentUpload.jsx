@@ -1,9 +1,10 @@
 import React, { useState } from 'react';
-import { Upload, FileText, X, CheckCircle } from 'lucide-react';
+import { Upload, FileText, X, CheckCircle, AlertCircle } from 'lucide-react';
 
 export const DocumentUpload = ({ onUpload, uploadedDocs = [] }) => {
   const [isDragging, setIsDragging] = useState(false);
   const [uploading, setUploading] = useState(false);
+  const [errors, setErrors] = useState([]);
 
   const handleDragOver = (e) => {
     e.preventDefault();
@@ -37,8 +38,14 @@ export const DocumentUpload = ({ onUpload, uploadedDocs = [] }) => {
 
   const handleUpload = async (files) => {
     setUploading(true);
+    setErrors([]);
     for (const file of files) {
-      await onUpload(file);
+      try {
+        await onUpload(file);
+      } catch (error) {
+        console.error('Upload failed:', error);
+        setErrors(prev => [...prev, { name: file.name, message: error.message }]);
+      }
     }
     setUploading(false);
   };
@@ -92,6 +99,23 @@ export const DocumentUpload = ({ onUpload, uploadedDocs = [] }) => {
           )}
         </div>
 
+        {/* Failed Uploads */}
+        {errors.length > 0 && (
+          <div className="mt-4 grid gap-2">
+            {errors.map((error, index) => (
+              <div key={index} className="flex items-center gap-2 bg-red-50 rounded-lg p-2">
+                <AlertCircle className="h-4 w-4 text-red-500 flex-shrink-0" />
+                <span className="text-sm text-red-700 truncate flex-1 min-w-0">
+                  {error.name}: {error.message}
+                </span>
+                <button onClick={() => setErrors(prev => prev.filter((_, i) => i !== index))}>
+                  <X className="h-4 w-4 text-red-400 hover:text-red-600" />
+                </button>
+              </div>
+            ))}
+          </div>
+        )}
+
         {/* Uploaded Documents List */}
         {uploadedDocs.length > 0 && (
           <div className="mt-4">